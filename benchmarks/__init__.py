@@ -0,0 +1,7 @@
+"""
+Benchmarks of the hot paths on synthetic data, in the layout of asv.
+Each class may define params and param_names, setup() and time_* methods.
+Run all of them with `python -m benchmarks` or select some with a regular expression, e.g.
+    python -m benchmarks StrategyStages
+Check import time of entry points against the budget with `python -m benchmarks.bench_import`.
+"""
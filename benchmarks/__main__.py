@@ -0,0 +1,103 @@
+import argparse
+import importlib
+import inspect
+import itertools
+import re
+import timeit
+import tracemalloc
+
+import numpy as np
+
+
+MODULES = [
+    "benchmarks.bench_strategy",
+    "benchmarks.bench_datareader",
+    "benchmarks.bench_import",
+]
+
+
+def _param_sets(cls) -> list[tuple]:
+    params = getattr(cls, "params", None)
+    if params is None:
+        return [()]
+    # a flat list is the values of a single parameter
+    if not any(isinstance(p, (list, tuple)) for p in params):
+        params = [params]
+    return list(itertools.product(*params))
+
+
+def _label(cls, params: tuple) -> str:
+    names = getattr(cls, "param_names", [f"param{i}" for i in range(len(params))])
+    return ", ".join(f"{k}={v}" for k, v in zip(names, params))
+
+
+def run(pattern=None, repeat=5, number=1):
+    """
+    Run benchmarks and print the best and median time of each.
+    Methods named time_* are timed, and methods named peakmem_* report the peak of memory allocated by a call, traced
+    by tracemalloc.
+    :param pattern: Regular expression selecting benchmarks by module.Class.method.
+    :param repeat: Number of measurements.
+    :param number: Number of calls in a measurement.
+    """
+    regex = re.compile(pattern) if pattern else None
+    print(f"{'benchmark':<70} {'best':>10} {'median':>10}")
+    for module_name in MODULES:
+        module = importlib.import_module(module_name)
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module_name:
+                continue
+            methods = [m for m in dir(cls) if m.startswith(("time_", "peakmem_"))]
+            methods = [m for m in methods if regex is None or regex.search(f"{module_name}.{cls_name}.{m}")]
+            if not methods:
+                continue
+            for params in _param_sets(cls):
+                bench = cls()
+                if hasattr(bench, "setup"):
+                    bench.setup(*params)
+                try:
+                    for m in methods:
+                        func = getattr(bench, m)
+                        name = f"{cls_name}.{m}({_label(cls, params)})"
+                        if m.startswith("peakmem_"):
+                            peaks = np.array([_peak_memory(func, params) for _ in range(repeat)])
+                            print(f"{name:<70} {_format_bytes(peaks.min()):>10} {_format_bytes(np.median(peaks)):>10}")
+                            continue
+                        times = np.array(timeit.repeat(lambda: func(*params), repeat=repeat, number=number)) / number
+                        print(f"{name:<70} {_format(times.min()):>10} {_format(np.median(times)):>10}")
+                finally:
+                    if hasattr(bench, "teardown"):
+                        bench.teardown(*params)
+
+
+def _peak_memory(func, params: tuple) -> int:
+    # memory allocated before the call, such as data prepared by setup, is not counted
+    tracemalloc.start()
+    try:
+        func(*params)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _format(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.3f}s"
+
+
+def _format_bytes(size: float) -> str:
+    if size < 1 << 20:
+        return f"{size / (1 << 10):.1f}KB"
+    return f"{size / (1 << 20):.1f}MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run benchmarks on synthetic data.")
+    parser.add_argument("pattern", nargs="?", help="regular expression selecting benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="number of measurements")
+    parser.add_argument("--number", type=int, default=1, help="number of calls in a measurement")
+    args = parser.parse_args()
+    run(args.pattern, args.repeat, args.number)
@@ -0,0 +1,56 @@
+import tempfile
+
+import numpy as np
+
+from benchmarks.synthetic import SyntheticDataReader, generate, synthetic_tickers
+from core.cache import PriceCache
+from core.datareader import _read_cached
+from core.panel import PricePanel
+
+
+START = "2000-01-01"
+END = "2024-12-31"
+
+
+class ReadData:
+    """
+    Reading daily data through the price cache and parsing it into the layout of ReadData.
+    """
+
+    params = [[5, 20], [16, 64]]
+    param_names = ["years", "n_tickers"]
+
+    def setup(self, years, n_tickers):
+        self.tickers = synthetic_tickers(n_tickers, krw_ratio=0.25)
+        self.reader = SyntheticDataReader(years=years)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.cache_dir.name)
+        _read_cached(self.reader, self.tickers, self.cache, start=START, end=END)
+
+        df = generate(self.tickers, years)
+        # Naver serves values as strings
+        self.frame = df
+        self.frame_text = df.astype(str)
+        self.panel = PricePanel.from_frame(df)
+
+    def teardown(self, years, n_tickers):
+        self.cache_dir.cleanup()
+
+    def time_read_cached_cold(self, years, n_tickers):
+        self.cache.invalidate()
+        _read_cached(self.reader, self.tickers, self.cache, start=START, end=END)
+
+    def time_read_cached_warm(self, years, n_tickers):
+        _read_cached(self.reader, self.tickers, self.cache, start=START, end=END)
+
+    def time_parse_text(self, years, n_tickers):
+        PricePanel.from_frame(self.frame_text)
+
+    def time_panel_from_frame(self, years, n_tickers):
+        PricePanel.from_frame(self.frame)
+
+    def time_panel_to_frame(self, years, n_tickers):
+        self.panel.to_frame()
+
+    def time_panel_float32(self, years, n_tickers):
+        PricePanel.from_frame(self.frame, dtype=np.float32)
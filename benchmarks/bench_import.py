@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds allowed to import each module in a fresh interpreter
+IMPORT_BUDGET = {
+    "core.strategy": 1.0,
+    "core.sweep": 1.0,
+    "core.live": 1.0,
+    "script.experiment": 1.0,
+}
+
+# backends which should be loaded only on first use
+LAZY_MODULES = ["yfinance", "pandas_datareader", "tqdm", "quantstats", "matplotlib", "seaborn"]
+
+
+def import_time(module: str) -> float:
+    """
+    Get wall time to import a module in a fresh interpreter, excluding the start of the interpreter.
+    :param module: Module name.
+    :return: Seconds.
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def loaded_lazy_modules(module: str) -> list[str]:
+    """
+    Get backends loaded by importing a module, which should be none.
+    :param module: Module name.
+    :return: Loaded backends.
+    """
+    code = f"import sys; import {module}; print('loaded:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in out.stdout.strip().splitlines()[-1][len("loaded:"):].split(",") if m]
+
+
+class ImportTime:
+    """
+    Import time of entry points in a fresh interpreter.
+    """
+
+    params = list(IMPORT_BUDGET)
+    param_names = ["module"]
+
+    def time_import(self, module):
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True)
+
+
+def check() -> bool:
+    """
+    Check import time of entry points against the budget.
+    :return: Whether all entry points are within the budget without loading backends.
+    """
+    ok = True
+    for module, budget in IMPORT_BUDGET.items():
+        seconds = min(import_time(module) for _ in range(3))
+        loaded = loaded_lazy_modules(module)
+        within = seconds <= budget and not loaded
+        ok &= within
+        print(f"{module:<20} {seconds:6.3f}s / {budget:.1f}s {'ok' if within else 'OVER'}"
+              + (f" loaded {loaded}" if loaded else ""))
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check() else 1)
@@ -0,0 +1,122 @@
+from benchmarks.synthetic import synthetic_tickers, synthetic_universe
+from core import fx, trading_calendar
+from core.score import score_engine
+from core.strategy import SAA, BAA, HAA, Alternatives
+from core.streaming import stream_strategy
+from core.ticker import *
+
+
+def make_strategy(name: str):
+    tickers_canary = [SPY, EFA, EEM, AGG]
+    tickers_risk = [SPY, QQQ, IWM, VGK, EWJ, EEM, VNQ, DBC, GLD, TLT, HYG, LQD]
+    tickers_safe = [TLT, IEF, AGG, TIP, LQD, BIL, DBC]
+    if name == "SAA":
+        return SAA("SAA", [SPY, TLT_H, IEF, GLD, DBC_H], [30, 40, 15, 7.5, 7.5])
+    if name == "BAA":
+        return BAA("BAA", tickers_canary, tickers_risk, tickers_safe, n_risk=6, n_safe=3)
+    if name == "HAA":
+        return HAA("HAA", [TIP, SPY], [SPY, QQQ, IWM, EFA, EEM, IYR, DBC, TLT, IEF, GLD], [IEF, BIL, LQD],
+                   n_risk=4, n_safe=1)
+    if name == "Alternatives":
+        return Alternatives("Alternatives", make_strategy("BAA"), {QQQ: SPY})
+    raise NotImplementedError(f"Strategy[{name}] is not implemented.")
+
+
+def clear_caches():
+    # benchmarks measure the computation, not cached results
+    fx.clear_cache()
+    trading_calendar.clear_cache()
+    score_engine.clear()
+
+
+class StrategyStages:
+    """
+    Each stage of Strategy.analyze() over 20 years of data.
+    """
+
+    params = ["SAA", "BAA", "HAA", "Alternatives"]
+    param_names = ["strategy"]
+
+    def setup(self, name):
+        self.strategy = make_strategy(name)
+        self.universe = synthetic_universe([self.strategy], years=20)
+        self.data = self.strategy.read_data(self.strategy.tickers, universe=self.universe)
+        self.trading_days = self.strategy.get_trading_days(self.data, "end")
+        self.asset_weights = self.strategy.calculate_asset_weights(self.data, self.trading_days)
+        clear_caches()
+
+    def time_read_data(self, name):
+        self.strategy.read_data(self.strategy.tickers, universe=self.universe)
+
+    def time_get_trading_days(self, name):
+        trading_calendar.clear_cache()
+        self.strategy.get_trading_days(self.data, "end")
+
+    def time_calculate_asset_weights(self, name):
+        score_engine.clear()
+        self.strategy.calculate_asset_weights(self.data, self.trading_days)
+
+    def time_calculate_profit(self, name):
+        self.strategy.calculate_profit(self.data, self.asset_weights)
+
+    def time_calculate_profit_band(self, name):
+        self.strategy.calculate_profit(self.data, self.asset_weights, band=0.05, band_daily=True)
+
+    def time_calculate_profit_capital(self, name):
+        self.strategy.calculate_profit(self.data, self.asset_weights, slippage={"KRW": 0.001, "USD": 0.003},
+                                       capital=1e8)
+
+    def time_analyze(self, name):
+        clear_caches()
+        self.strategy.analyze(universe=self.universe)
+
+
+class HistoryLength:
+    """
+    Scaling of Strategy.analyze() over the length of history.
+    """
+
+    params = [[5, 10, 20, 40, 80], ["SAA", "BAA"]]
+    param_names = ["years", "strategy"]
+
+    def setup(self, years, name):
+        self.strategy = make_strategy(name)
+        self.universe = synthetic_universe([self.strategy], years=years)
+        self.data = self.strategy.read_data(self.strategy.tickers, universe=self.universe)
+        self.asset_weights = self.strategy.calculate_asset_weights(
+            self.data, self.strategy.get_trading_days(self.data, "end"))
+
+    def time_analyze(self, years, name):
+        clear_caches()
+        self.strategy.analyze(universe=self.universe)
+
+    def peakmem_calculate_profit(self, years, name):
+        clear_caches()
+        self.strategy.calculate_profit(self.data, self.asset_weights)
+
+    def peakmem_stream_strategy(self, years, name):
+        clear_caches()
+        stream_strategy(self.strategy, universe=self.universe)
+
+
+class UniverseSize:
+    """
+    Scaling of Strategy.analyze() over the number of assets.
+    """
+
+    params = [[4, 16, 64, 256], ["SAA", "BAA"]]
+    param_names = ["n_tickers", "strategy"]
+
+    def setup(self, n_tickers, name):
+        tickers = synthetic_tickers(n_tickers, krw_ratio=0.25)
+        if name == "SAA":
+            self.strategy = SAA("SAA", tickers, [1] * n_tickers)
+        else:
+            tickers_safe = synthetic_tickers(4, prefix="SAFE")
+            self.strategy = BAA("BAA", tickers[:4], tickers, tickers_safe, ticker_bill=tickers_safe[-1],
+                                n_risk=max(n_tickers // 2, 1), n_safe=3)
+        self.universe = synthetic_universe([self.strategy], years=20)
+
+    def time_analyze(self, n_tickers, name):
+        clear_caches()
+        self.strategy.analyze(universe=self.universe)
@@ -0,0 +1,115 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from core.datareader import DataReader
+from core.ticker import Ticker, KRW
+from core.universe import Universe
+
+
+ATTRIBUTES = ["Close", "High", "Low", "Open", "Volume"]
+
+DEFAULT_END = "2024-12-31"
+
+
+def synthetic_tickers(n: int, krw_ratio=0.0, prefix="SYN") -> list[Ticker]:
+    """
+    Get synthetic tickers.
+    :param n: Number of tickers.
+    :param krw_ratio: Ratio of tickers traded in KRW. The others are traded in USD.
+    :param prefix: Prefix of symbols.
+    :return: Tickers.
+    """
+    n_krw = int(round(n * krw_ratio))
+    return [Ticker(f"{prefix}{i:03d}", currency="KRW" if i < n_krw else "USD") for i in range(n)]
+
+
+def generate(tickers: list[Ticker], years=20, end=DEFAULT_END, seed=0, missing=0.0) -> pd.DataFrame:
+    """
+    Generate deterministic daily data of tickers, in the layout of ReadData.
+    Prices follow a geometric random walk seeded by the symbol, so aliased tickers share the same data and the
+    data of a ticker doesn't depend on the other tickers. KRW=X moves around 1200 and KRW assets are priced in
+    thousands.
+    :param tickers: Tickers.
+    :param years: Length of the history in years.
+    :param end: Last date.
+    :param seed: Seed combined with each symbol.
+    :param missing: Ratio of dates each symbol misses, like holidays of other markets.
+    :return: MultiIndex DataFrame of (attribute, ticker) columns.
+    """
+    end = pd.Timestamp(end)
+    index = pd.bdate_range(end - pd.DateOffset(years=years), end, name="Date", freq="B")
+    index = pd.DatetimeIndex(index, freq=None)
+
+    symbols = {}
+    for t in tickers:
+        if t.symbol not in symbols:
+            symbols[t.symbol] = _generate_symbol(t, index, seed, missing)
+
+    columns = pd.MultiIndex.from_product([ATTRIBUTES, tickers])
+    data = {col: symbols[col[1].symbol][col[0]] for col in columns}
+    return pd.DataFrame(data=data, index=index, columns=columns)
+
+
+def _generate_symbol(ticker: Ticker, index: pd.DatetimeIndex, seed: int, missing: float) -> dict:
+    rng = np.random.default_rng([zlib.crc32(ticker.symbol.encode()), seed])
+    n = len(index)
+    if ticker == KRW:
+        level, drift, vol = 1200.0, 0.0, 0.005
+    elif ticker.currency == "KRW":
+        level, drift, vol = 10000.0, 0.0002, 0.012
+    else:
+        level, drift, vol = 100.0, 0.0003, 0.012
+
+    close = level * np.exp(np.cumsum(rng.normal(drift, vol, n)))
+    open_ = close * np.exp(rng.normal(0, vol / 2, n))
+    high = np.maximum(close, open_) * np.exp(np.abs(rng.normal(0, vol / 2, n)))
+    low = np.minimum(close, open_) * np.exp(-np.abs(rng.normal(0, vol / 2, n)))
+    volume = np.floor(rng.lognormal(13, 1, n))
+    data = {"Close": close, "High": high, "Low": low, "Open": open_, "Volume": volume}
+
+    if missing > 0:
+        is_missing = rng.random(n) < missing
+        for v in data.values():
+            v[is_missing] = np.nan
+    return data
+
+
+class SyntheticDataReader(DataReader):
+    """
+    DataReader serving synthetic data, for benchmarks without network.
+    """
+
+    inclusive_end = False
+
+    def __init__(self, years=20, end=DEFAULT_END, seed=0, missing=0.0):
+        self.years = years
+        self.end = end
+        self.seed = seed
+        self.missing = missing
+
+    def read(self, tickers: list[Ticker], start=None, end=None, keepna=False, **kwargs) -> pd.DataFrame:
+        df = generate(tickers, self.years, self.end, self.seed, self.missing)
+        if start is not None:
+            df = df.loc[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df.loc[df.index < pd.Timestamp(end)]
+        if not keepna:
+            df = df.dropna()
+        return df
+
+
+def synthetic_universe(strategies, years=20, in_krw=True, seed=0, missing=0.0) -> Universe:
+    """
+    Get a universe of strategies loaded with synthetic data.
+    :param strategies: Strategies.
+    :param years: Length of the history in years.
+    :param in_krw: If true, include KRW for currency conversion.
+    :param seed: Seed combined with each symbol.
+    :param missing: Ratio of dates each symbol misses.
+    :return: Universe.
+    """
+    universe = Universe.from_strategies(strategies, in_krw=in_krw)
+    universe.data = generate(universe.tickers, years, seed=seed, missing=missing)
+    return universe
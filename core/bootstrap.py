@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from core import kernel, metrics
+from core.strategy import Strategy
+
+
+DEFAULT_BLOCK_SIZE = 21
+
+# memory of the kernel per path and per (day, asset), in bytes
+KERNEL_BYTES = 8 * 12
+DEFAULT_MAX_MEMORY = 2 ** 28
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def block_indices(starts: np.ndarray, n_days: int, block_size: int) -> np.ndarray:
+    """
+    Get indices of days resampled by circular blocks.
+    :param starts: First index of each block of each path. (P, B)
+    :param n_days: Number of days to resample from and into.
+    :param block_size: Number of consecutive days in a block.
+    :return: Resampled indices of each path. (P, n_days)
+    """
+    indices = (starts[..., np.newaxis] + np.arange(block_size)) % n_days
+    return indices.reshape(len(starts), -1)[:, :n_days]
+
+
+class Bootstrap:
+    """
+    Monte Carlo robustness test of a strategy by block bootstrap of daily asset returns.
+    Each synthetic path resamples blocks of consecutive days, keeping the autocorrelation and cross-asset
+    correlation within a block, and replays the historical trading days and target weights of the strategy on it.
+    Weights are not recalculated from the synthetic prices, so paths measure the risk of the asset mix rather
+    than the timing of the strategy.
+    """
+
+    def __init__(self, index: pd.DatetimeIndex, change: np.ndarray, rebalance: np.ndarray, weights: np.ndarray,
+                 slippage=0.003):
+        """
+        :param index: Days of the backtest. (T,)
+        :param change: Daily returns of assets. Returns of the first day are ignored. (T, N)
+        :param rebalance: Positions of trading days. The first one is 0. (K,)
+        :param weights: Target weights of assets at trading days. (K, N)
+        :param slippage: Slippage on the traded portion of the portfolio.
+        """
+        self.index = index
+        self.change = change
+        self.rebalance = rebalance
+        self.weights = weights
+        self.slippage = slippage
+
+    @classmethod
+    def from_strategy(cls, strategy: Strategy, trading_day="end", trading_price="Close", start=None, end=None,
+                      in_krw=True, slippage=0.003, base_currency=None, **kwargs) -> "Bootstrap":
+        """
+        Get daily asset returns and weights of the strategy, aligned as in Strategy.calculate_profit().
+        :param strategy: Strategy.
+        :param trading_day: Rebalancing day.
+        :param trading_price: Price used when rebalancing assets.
+        :param start: Start date of analyzing period.
+        :param end: End date of analyzing period.
+        :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param slippage: Slippage on the traded portion of the portfolio.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :param kwargs: Other parameters of Strategy.analyze, such as universe.
+        :return: Bootstrap.
+        """
+        data, asset_weights = strategy.asset_weights_from_tickers(strategy.tickers, trading_day, trading_price,
+                                                                  start, end, in_krw,
+                                                                  base_currency=base_currency, **kwargs)
+        index, _, change, rebalance, weights = strategy.simulation_inputs(data, asset_weights, in_krw, base_currency,
+                                                                          trading_price, kwargs.get("universe"))
+        return cls(index, change, rebalance, weights, slippage)
+
+    def paths(self, n_paths=1000, block_size=DEFAULT_BLOCK_SIZE, seed=None, chunk_size=None):
+        """
+        Generate total return of synthetic paths in chunks.
+        Paths only depend on the seed, not on the chunk size.
+        :param n_paths: Number of paths.
+        :param block_size: Number of consecutive days in a block.
+        :param seed: Seed of the random generator.
+        :param chunk_size: Number of paths simulated at once. By default, limited by DEFAULT_MAX_MEMORY.
+        :return: Generator of total return of paths in a chunk. (P, T)
+        """
+        n_days, n_assets = self.change.shape
+        # the first day has no return, so the other days are resampled
+        n_returns = n_days - 1
+        if chunk_size is None:
+            chunk_size = max(DEFAULT_MAX_MEMORY // (KERNEL_BYTES * max(n_days * n_assets, 1)), 1)
+
+        block_size = max(min(block_size, n_returns), 1)
+        n_blocks = -(-n_returns // block_size)
+        starts = np.random.default_rng(seed).integers(0, max(n_returns, 1), size=(n_paths, n_blocks))
+
+        for i in range(0, n_paths, chunk_size):
+            indices = block_indices(starts[i:i + chunk_size], n_returns, block_size) + 1
+            change = np.zeros((len(indices), n_days, n_assets))
+            change[:, 1:] = self.change[indices]
+            weights = np.broadcast_to(self.weights, (len(indices),) + self.weights.shape)
+            _, total_return, _, _ = kernel.simulate(change, self.rebalance, weights, self.slippage)
+            yield total_return
+
+    def simulate(self, n_paths=1000, block_size=DEFAULT_BLOCK_SIZE, seed=None, chunk_size=None,
+                 periods=metrics.PERIODS) -> pd.DataFrame:
+        """
+        Get metrics of synthetic paths.
+        :param n_paths: Number of paths.
+        :param block_size: Number of consecutive days in a block.
+        :param seed: Seed of the random generator.
+        :param chunk_size: Number of paths simulated at once.
+        :param periods: Number of periods in a year.
+        :return: Total return, CAGR, volatility and max drawdown of each path row.
+        """
+        years = (self.index[-1] - self.index[0]).days / 365.25
+        summaries = []
+        for total_return in self.paths(n_paths, block_size, seed, chunk_size):
+            returns = total_return[:, 1:] / total_return[:, :-1] - 1
+            tr = total_return[:, -1]
+            summaries.append(pd.DataFrame({
+                "total_return": tr,
+                "cagr": tr ** (1 / years) - 1 if years > 0 else np.nan,
+                "volatility": returns.std(axis=1, ddof=1) * np.sqrt(periods) if returns.shape[1] > 1 else np.nan,
+                "max_drawdown": (total_return / np.maximum.accumulate(total_return, axis=1) - 1).min(axis=1),
+            }))
+        if not summaries:
+            return pd.DataFrame(columns=["total_return", "cagr", "volatility", "max_drawdown"])
+        return pd.concat(summaries, ignore_index=True)
+
+
+def summarize(paths: pd.DataFrame, quantiles=QUANTILES) -> pd.DataFrame:
+    """
+    Get distribution statistics of metrics of synthetic paths.
+    :param paths: Metrics of each path row, such as the result of Bootstrap.simulate().
+    :param quantiles: Quantiles to report.
+    :return: Mean, standard deviation and quantiles of each metric row.
+    """
+    summary = paths.quantile(list(quantiles)).T
+    summary.columns = [f"q{q * 100:g}" for q in quantiles]
+    summary.insert(0, "std", paths.std())
+    summary.insert(0, "mean", paths.mean())
+    return summary
+
+
+def bootstrap_strategies(strategies: list[Strategy], n_paths=1000, block_size=DEFAULT_BLOCK_SIZE, seed=None,
+                         chunk_size=None, quantiles=QUANTILES, trading_day="end", **kwargs) -> pd.DataFrame:
+    """
+    Compare distribution statistics of strategies. Each strategy is resampled with the same seed.
+    :param strategies: Strategies.
+    :param n_paths: Number of paths of each strategy.
+    :param block_size: Number of consecutive days in a block.
+    :param seed: Seed of the random generator.
+    :param chunk_size: Number of paths simulated at once.
+    :param quantiles: Quantiles to report.
+    :param trading_day: Rebalancing day.
+    :param kwargs: Other parameters of Bootstrap.from_strategy, such as universe.
+    :return: Distribution statistics of (strategy, metric) rows.
+    """
+    summaries = {}
+    for st in strategies:
+        paths = Bootstrap.from_strategy(st, trading_day, **kwargs).simulate(n_paths, block_size, seed, chunk_size)
+        summaries[str(st)] = summarize(paths, quantiles)
+    return pd.concat(summaries, names=["strategy", "metric"])
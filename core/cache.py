@@ -0,0 +1,374 @@
+import dataclasses
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from core.ticker import Ticker
+
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "QUANT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+DEFAULT_MAX_AGE = timedelta(hours=12)
+DEFAULT_RESULT_DIR = os.environ.get("QUANT_RESULT_DIR", os.path.join(DEFAULT_CACHE_DIR, "results"))
+DEFAULT_MAX_RESULTS = 1024
+# number of saves between evictions, so that the directory is not listed on every save
+EVICT_INTERVAL = 32
+
+# modules which determine a profit from data, in addition to the modules of strategy classes
+RESULT_MODULES = ["core.strategy", "core.kernel", "core.simulator", "core.score", "core.fx", "core.trading_calendar"]
+
+# parquet needs pyarrow or fastparquet, fall back to pickle without them
+_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet") else "pkl"
+
+
+class PriceCache:
+    """
+    Persistent price cache.
+    Daily data of each (data source, symbol) is stored in its own file with a json file of freshness metadata:
+        {cache_dir}/{data_source}/{symbol}.parquet
+        {cache_dir}/{data_source}/{symbol}.json
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age=DEFAULT_MAX_AGE, offline=False):
+        """
+        :param cache_dir: Directory of cache files.
+        :param max_age: Up-to-date reads refresh cached data that misses any day up to today, or that was fetched
+            longer ago than this, so that a bar fetched during a trading day is settled.
+        :param offline: If true, never fetch and serve whatever is cached.
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.offline = offline
+
+    def _path(self, ticker: Ticker, ext: str) -> str:
+        symbol = ticker.symbol.replace("/", "_").replace("\\", "_")
+        return os.path.join(self.cache_dir, ticker.data_source, f"{symbol}.{ext}")
+
+    def load_meta(self, ticker: Ticker) -> dict:
+        path = self._path(ticker, "json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def load(self, ticker: Ticker) -> pd.DataFrame:
+        meta = self.load_meta(ticker)
+        if meta is None:
+            return None
+        path = self._path(ticker, meta["format"])
+        if not os.path.exists(path):
+            return None
+        if meta["format"] == "parquet":
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def save(self, ticker: Ticker, df: pd.DataFrame, meta: dict):
+        os.makedirs(os.path.dirname(self._path(ticker, "json")), exist_ok=True)
+        meta = dict(meta, format=_FORMAT, rows=len(df))
+        if len(df) > 0:
+            meta["first"] = df.index[0].isoformat()
+            meta["last"] = df.index[-1].isoformat()
+            meta["previous"] = df.index[max(len(df) - 2, 0)].isoformat()
+
+        # write to temporary files first, so that readers never see a half-written file
+        path = self._path(ticker, _FORMAT)
+        if _FORMAT == "parquet":
+            df.to_parquet(path + ".tmp")
+        else:
+            df.to_pickle(path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        path = self._path(ticker, "json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def missing_ranges(self, ticker: Ticker, start, end, inclusive_end=True, options=None) -> list:
+        """
+        Get date ranges which should be fetched to serve [start, end] from the cache.
+        :param ticker: Ticker.
+        :param start: Start date.
+        :param end: End date. None means up to date.
+        :param inclusive_end: If false, the data source excludes the end date.
+        :param options: Options of data source which affect the data. Cached data of other options is discarded.
+        :return: List of (start, end) to fetch.
+        """
+        start = pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        meta = self.load_meta(ticker)
+        if meta is None or meta.get("options") != options:
+            return [] if self.offline else [(start, end)]
+        if self.offline:
+            return []
+
+        ranges = []
+        if start < pd.Timestamp(meta["start"]):
+            ranges.append((start, pd.Timestamp(meta["start"])))
+
+        covered_end = pd.Timestamp(meta["end"])
+        fetched_at = datetime.fromisoformat(meta["fetched_at"])
+        if end is None:
+            stale = pd.Timestamp.today().normalize() > covered_end or datetime.now() - fetched_at > self.max_age
+        else:
+            stale = (end if inclusive_end else end - pd.Timedelta(days=1)) > covered_end
+        if stale:
+            # fetch again from the bar before the last cached bar, which might have been an intraday bar,
+            # so that a settled bar is still compared to detect re-adjusted prices
+            last = meta.get("previous") or meta.get("last") or meta["start"]
+            ranges.append((pd.Timestamp(last), end))
+        return ranges
+
+    def update(self, ticker: Ticker, df_new: pd.DataFrame, start, end, inclusive_end=True, options=None):
+        """
+        Merge fetched data into the cache.
+        If the overlapping bars differ from cached ones (e.g. re-adjusted prices after a dividend),
+        cached data before the fetched range is discarded so that it is fetched again.
+        The last cached bar is overwritten without comparison, as it might have been an intraday bar.
+        :param ticker: Ticker.
+        :param df_new: Fetched data of the ticker.
+        :param start: Start date of the fetched range.
+        :param end: End date of the fetched range. None means up to date.
+        :param inclusive_end: If false, the data source excludes the end date.
+        :param options: Options of data source which affect the data.
+        """
+        start = pd.Timestamp(start)
+        today = pd.Timestamp.today().normalize()
+        if end is None:
+            covered_end = today
+        else:
+            covered_end = min(pd.Timestamp(end) - pd.Timedelta(days=0 if inclusive_end else 1), today)
+        df_new = df_new.dropna(how="all").astype(float)
+
+        df = self.load(ticker)
+        meta = self.load_meta(ticker)
+        if df is None or meta.get("options") != options:
+            meta = {"start": start.isoformat(), "end": covered_end.isoformat()}
+        else:
+            overlap = df.index.intersection(df_new.index)
+            overlap = overlap[overlap < df.index[-1]] if len(df) > 0 else overlap
+            columns = df.columns.intersection(df_new.columns)
+            if len(overlap) > 0 and not np.allclose(df.loc[overlap, columns], df_new.loc[overlap, columns],
+                                                    rtol=1e-6, equal_nan=True):
+                print(f"PriceCache: cached data of {ticker.data_source}:{ticker.symbol} is outdated")
+                df = df.iloc[:0]
+                meta = {"start": start.isoformat(), "end": covered_end.isoformat()}
+            else:
+                meta = {"start": min(start, pd.Timestamp(meta["start"])).isoformat(),
+                        "end": max(covered_end, pd.Timestamp(meta["end"])).isoformat()}
+            df_new = pd.concat((df.loc[~df.index.isin(df_new.index)], df_new)).sort_index()
+
+        meta.update(symbol=ticker.symbol,
+                    data_source=ticker.data_source,
+                    options=options,
+                    fetched_at=datetime.now().isoformat())
+        self.save(ticker, df_new, meta)
+
+    def invalidate(self, tickers: list[Ticker] = None, data_source: str = None):
+        """
+        Remove cached data.
+        :param tickers: Tickers to remove. If None, all tickers (of the data source) are removed.
+        :param data_source: Data source to remove.
+        """
+        if tickers is None:
+            files = []
+            for ds in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+                if data_source is not None and ds != data_source:
+                    continue
+                files += [os.path.join(self.cache_dir, ds, f) for f in os.listdir(os.path.join(self.cache_dir, ds))]
+        else:
+            files = [self._path(t, ext) for t in tickers for ext in ("json", "parquet", "pkl")]
+
+        for f in files:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def info(self) -> pd.DataFrame:
+        """
+        Get freshness metadata of all cached data.
+        """
+        metas = []
+        for ds in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+            for f in sorted(os.listdir(os.path.join(self.cache_dir, ds))):
+                if f.endswith(".json"):
+                    with open(os.path.join(self.cache_dir, ds, f), "r") as fp:
+                        metas.append(json.load(fp))
+        return pd.DataFrame(metas)
+
+
+_price_cache = None
+
+
+def get_price_cache() -> PriceCache:
+    """
+    Get the default price cache.
+    """
+    global _price_cache
+    if _price_cache is None:
+        _price_cache = PriceCache(offline=os.environ.get("QUANT_OFFLINE", "0") == "1")
+    return _price_cache
+
+
+def set_price_cache(cache: PriceCache):
+    """
+    Replace the default price cache.
+    """
+    global _price_cache
+    _price_cache = cache
+
+
+class ResultCache:
+    """
+    Persistent cache of daily profits of Strategy.analyze().
+    Each profit is stored under a content address, the hash of the strategy definition, analyze parameters,
+    input data and source code of the modules computing it:
+        {cache_dir}/{key}.pkl
+    Least recently used profits are removed beyond max_entries, checked every EVICT_INTERVAL saves of a process.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_RESULT_DIR, max_entries=DEFAULT_MAX_RESULTS):
+        """
+        :param cache_dir: Directory of cache files.
+        :param max_entries: Maximum number of cached profits.
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._saves = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def load(self, key: str) -> pd.DataFrame:
+        path = self._path(key)
+        try:
+            profit = pd.read_pickle(path)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        return profit
+
+    def save(self, key: str, profit: pd.DataFrame):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write to a temporary file first, so that readers never see a half-written file
+        path = self._path(key)
+        profit.to_pickle(f"{path}.{os.getpid()}.tmp")
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+        self._saves += 1
+        if self._saves % EVICT_INTERVAL == 1:
+            self._evict()
+
+    def _evict(self):
+        # other processes may remove files concurrently
+        mtimes = {}
+        for f in os.listdir(self.cache_dir):
+            if f.endswith(".pkl"):
+                try:
+                    mtimes[f] = os.path.getmtime(os.path.join(self.cache_dir, f))
+                except FileNotFoundError:
+                    pass
+        if len(mtimes) <= self.max_entries:
+            return
+        for f in sorted(mtimes, key=mtimes.get)[:len(mtimes) - self.max_entries]:
+            try:
+                os.remove(os.path.join(self.cache_dir, f))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """
+        Remove all cached profits.
+        """
+        for f in os.listdir(self.cache_dir) if os.path.isdir(self.cache_dir) else []:
+            try:
+                os.remove(os.path.join(self.cache_dir, f))
+            except FileNotFoundError:
+                pass
+
+
+def result_key(strategy, data: pd.DataFrame, **params) -> str:
+    """
+    Get the content address of a profit.
+    :param strategy: Strategy. All its attributes but the name define it, including nested strategies.
+    :param data: Input data of the strategy.
+    :param params: Parameters of Strategy.analyze affecting the profit.
+    :return: Hex digest.
+    """
+    modules = set(RESULT_MODULES)
+    definition = _fingerprint(strategy, modules)
+    h = hashlib.sha256()
+    h.update(json.dumps({"strategy": definition, "params": _fingerprint(params, modules)},
+                        sort_keys=True, default=repr).encode())
+    for name in sorted(modules):
+        h.update(_source_digest(name).encode())
+    h.update(repr(list(data.columns)).encode())
+    h.update(np.asarray(data.index.values, dtype="datetime64[ns]").tobytes())
+    h.update(np.ascontiguousarray(data.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def _fingerprint(obj, modules: set):
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    if isinstance(obj, (np.integer, np.floating)):
+        return obj.item()
+    if dataclasses.is_dataclass(obj):
+        return repr(obj)
+    if isinstance(obj, np.ndarray):
+        return [str(obj.dtype), list(obj.shape), obj.tolist()]
+    if isinstance(obj, dict):
+        return sorted([[_fingerprint(k, modules), _fingerprint(v, modules)] for k, v in obj.items()], key=repr)
+    if isinstance(obj, (set, frozenset)):
+        return sorted([_fingerprint(x, modules) for x in obj], key=repr)
+    if isinstance(obj, (list, tuple)):
+        return [_fingerprint(x, modules) for x in obj]
+    if hasattr(obj, "__dict__"):
+        cls = type(obj)
+        modules.update(c.__module__ for c in cls.__mro__ if c.__module__ not in ("builtins", "abc"))
+        attributes = {k: _fingerprint(v, modules) for k, v in vars(obj).items() if k != "name"}
+        return {"class": f"{cls.__module__}.{cls.__qualname__}", "attributes": attributes}
+    return repr(obj)
+
+
+_source_digests = {}
+
+
+def _source_digest(module_name: str) -> str:
+    if module_name not in _source_digests:
+        module = sys.modules.get(module_name)
+        try:
+            source = inspect.getsource(module) if module is not None else ""
+        except (OSError, TypeError):
+            source = ""
+        _source_digests[module_name] = hashlib.sha256(source.encode()).hexdigest()
+    return _source_digests[module_name]
+
+
+# None until first use, False if disabled
+_result_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Get the default result cache.
+    :return: ResultCache, or None if disabled by QUANT_RESULT_CACHE=0 or set_result_cache(None).
+    """
+    global _result_cache
+    if _result_cache is None and os.environ.get("QUANT_RESULT_CACHE", "1") != "0":
+        _result_cache = ResultCache()
+    return _result_cache or None
+
+
+def set_result_cache(cache: ResultCache = None):
+    """
+    Replace the default result cache. None disables caching of results.
+    """
+    global _result_cache
+    _result_cache = cache if cache is not None else False
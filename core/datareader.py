@@ -1,26 +1,61 @@
 import abc
+import functools
+import importlib.util
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
-import pandas_datareader as pdr
-import yfinance as yf
-import yfinance.data
-from tqdm import tqdm
 
+from core import profiling
+from core.cache import PriceCache, get_price_cache
+from core.fetch import DEFAULT_MAX_WORKERS, fetch_all, get_rate_limiter, retry
+from core.panel import PricePanel
 from core.ticker import *
 
 
 class DataReader(abc.ABC):
 
+    # whether the data source includes the end date in the result
+    inclusive_end = True
+
     @staticmethod
     def read(tickers: list[Ticker], **kwargs) -> pd.DataFrame:
         ...
 
 
-class YahooDataReader(DataReader):
+# backends of data sources are imported on first use, which takes most of the import time
+
+@functools.lru_cache(maxsize=None)
+def _yfinance():
+    import yfinance as yf
+    import yfinance.data
 
     yf.data.TickerData.user_agent_headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36 Edg/133.0.0.0'
     }
+    return yf
+
+
+@functools.lru_cache(maxsize=None)
+def _naver_daily_reader():
+    import pandas_datareader.naver
+
+    class _NaverDailyReader(pandas_datareader.naver.NaverDailyReader):
+
+        def __init__(self, symbols, url, **kwargs):
+            super().__init__(symbols, **kwargs)
+            self._url = url
+
+        @property
+        def url(self):
+            return self._url
+
+    return _NaverDailyReader
+
+
+class YahooDataReader(DataReader):
+
+    inclusive_end = False
 
     @staticmethod
     def read(tickers: list[Ticker], start=None, end=None,
@@ -29,16 +64,16 @@ class YahooDataReader(DataReader):
 
         print(f"YahooDataReader: read {[str(t) for t in tickers]}")
         tickers_symbol = get_symbols(tickers)
-        df = yf.download(tickers_symbol, start=start, end=end,
-                         actions=actions, auto_adjust=auto_adjust, keepna=keepna, ignore_tz=True,
-                         **kwargs)
+        df = retry(_yfinance().download, tickers_symbol, start=start, end=end,
+                   actions=actions, auto_adjust=auto_adjust, keepna=keepna, ignore_tz=True,
+                   rate_limiter=get_rate_limiter("yahoo"),
+                   **kwargs)
         if len(tickers) == 1:
             df.columns = pd.MultiIndex.from_product([df.columns, tickers_symbol])
+        symbol_tickers = {t.symbol: t for t in tickers}
 
         # There are possibly redundant tickers
-        columns = pd.MultiIndex.from_product([df.columns.levels[0], tickers])
-        data = {col: df[(col[0], col[1].symbol)].copy() for col in columns}
-        df = pd.DataFrame(data=data)
+        df = PricePanel.from_frame(df.rename(columns=symbol_tickers, level=1)).to_frame(tickers)
         if not keepna:
             df.dropna(inplace=True)
 
@@ -47,72 +82,304 @@ class YahooDataReader(DataReader):
 
 class NaverDataReader(DataReader):
 
+    # endpoint of daily chart data, replaceable with a local server
+    url = "https://fchart.stock.naver.com/sise.nhn"
+
     @staticmethod
     def read(tickers: list[Ticker], start=None, end=None,
-             actions=False, auto_adjust=True, keepna=False,
+             actions=False, auto_adjust=True, keepna=False, max_workers=DEFAULT_MAX_WORKERS,
              **kwargs) -> pd.DataFrame:
 
         print(f"NaverDataReader: read {[str(t) for t in tickers]}")
-        tickers_symbol = get_symbols(tickers)
-        df = pd.DataFrame()
-        for symbol in tqdm(tickers_symbol):
-            df_symb = pdr.data.DataReader(symbol, data_source="naver", start=start, end=end)
-            df_symb.columns = pd.MultiIndex.from_product([df_symb.columns, [symbol]])
-            df = pd.concat((df, df_symb), axis=1)
+        tickers_symbol = list(dict.fromkeys(get_symbols(tickers)))
+
+        # retry is done by fetch_all
+        def read_symbol(symbol):
+            return _naver_daily_reader()(symbol, NaverDataReader.url, start=start, end=end, retry_count=0).read()
+
+        dfs = fetch_all(read_symbol, tickers_symbol, max_workers=max_workers, rate_limiter=get_rate_limiter("naver"))
+        df = pd.concat(dict(zip(tickers_symbol, dfs)), axis=1).swaplevel(axis=1)
+        symbol_tickers = {t.symbol: t for t in tickers}
 
         # There are possibly redundant tickers
-        columns = pd.MultiIndex.from_product([df.columns.levels[0], tickers])
-        data = {col: df[(col[0], col[1].symbol)].copy() for col in columns}
-        df = pd.DataFrame(data=data)
+        df = PricePanel.from_frame(df.rename(columns=symbol_tickers, level=1)).to_frame(tickers)
+        if not keepna:
+            df.dropna(inplace=True)
+
+        return df
+
+
+class LocalDataReader(DataReader):
+    """
+    DataReader serving daily data from a directory of files, one file of attribute columns for each symbol:
+        {directory}/{symbol}.parquet or {directory}/{symbol}.csv
+    """
+
+    # directory of files of the local data source
+    directory = os.environ.get(
+        "QUANT_LOCAL_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+    def __init__(self, directory=None, inclusive_end=True):
+        """
+        :param directory: Directory of files. If None, LocalDataReader.directory.
+        :param inclusive_end: Whether the end date is included in the result.
+        """
+        if directory is not None:
+            self.directory = directory
+        self.inclusive_end = inclusive_end
+
+    def read(self, tickers: list[Ticker], start=None, end=None, keepna=False, **kwargs) -> pd.DataFrame:
+        print(f"LocalDataReader: read {[str(t) for t in tickers]}")
+        data = {}
+        for symbol in dict.fromkeys(get_symbols(tickers)):
+            df = self.load(symbol)
+            if start is not None:
+                df = df.loc[df.index >= pd.Timestamp(start)]
+            if end is not None:
+                df = df.loc[df.index <= pd.Timestamp(end) if self.inclusive_end else df.index < pd.Timestamp(end)]
+            data[symbol] = df
+
+        df = PricePanel.from_symbols(data, tickers).to_frame()
         if not keepna:
             df.dropna(inplace=True)
+        return df
 
+    def load(self, symbol: str) -> pd.DataFrame:
+        path = os.path.join(self.directory, _file_name(symbol))
+        if os.path.exists(path + ".parquet"):
+            df = pd.read_parquet(path + ".parquet")
+        elif os.path.exists(path + ".csv"):
+            df = pd.read_csv(path + ".csv", index_col=0, parse_dates=True)
+        else:
+            raise FileNotFoundError(f"LocalDataReader: no data of Symbol[{symbol}] in {self.directory}")
+        df.index = pd.DatetimeIndex(df.index, name="Date")
+        return df.sort_index()
+
+    def save(self, symbol: str, df: pd.DataFrame):
+        """
+        Save daily data of a symbol, merged with the saved data. New values take precedence.
+        :param symbol: Symbol.
+        :param df: DataFrame of attribute columns.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        df = df.astype(float)
+        try:
+            df = df.combine_first(self.load(symbol))
+        except FileNotFoundError:
+            pass
+
+        path = os.path.join(self.directory, _file_name(symbol))
+        if _PARQUET:
+            df.to_parquet(path + ".parquet")
+        else:
+            df.to_csv(path + ".csv")
+
+
+class RecordingDataReader(DataReader):
+    """
+    DataReader recording what another DataReader returns into a directory of LocalDataReader.
+    """
+
+    def __init__(self, reader: DataReader, directory: str):
+        self.reader = reader
+        self.local = LocalDataReader(directory, reader.inclusive_end)
+        self.inclusive_end = reader.inclusive_end
+
+    def read(self, tickers: list[Ticker], keepna=False, **kwargs) -> pd.DataFrame:
+        df = self.reader.read(tickers, keepna=True, **kwargs)
+        for t in {t.symbol: t for t in tickers}.values():
+            if t in df.columns.get_level_values(1):
+                self.local.save(t.symbol, df.xs(t, axis=1, level=1))
+        if not keepna:
+            df = df.dropna()
         return df
 
 
+def _file_name(symbol: str) -> str:
+    return symbol.replace("/", "_").replace("\\", "_")
+
+
+# parquet needs pyarrow or fastparquet, fall back to CSV without them
+_PARQUET = importlib.util.find_spec("pyarrow") is not None or importlib.util.find_spec("fastparquet") is not None
+
+_DATA_READERS = {
+    "yahoo": YahooDataReader,
+    "naver": NaverDataReader,
+    "local": LocalDataReader,
+}
+
+# record data of remote data sources, or replay the recorded data without network
+REPLAY_MODE = os.environ.get("QUANT_REPLAY")
+REPLAY_DIR = os.environ.get(
+    "QUANT_REPLAY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".replay"))
+
+
+def register_data_reader(data_source: str, reader):
+    """
+    Register DataReader of a data source, used by tickers of the data source.
+    :param data_source: Data source such as 'yahoo'.
+    :param reader: DataReader class or instance.
+    """
+    _DATA_READERS[data_source] = reader
+
+
+def set_replay(mode: str = None, directory: str = None):
+    """
+    Set record/replay mode of remote data sources.
+    In 'record' mode, data read from remote data sources is saved in {directory}/{data_source}.
+    In 'replay' mode, the saved data is served by LocalDataReader instead of remote data sources.
+    ReadData bypasses the price cache in both modes, so that every read is recorded and replayed data never gets into
+    the cache of live data.
+    :param mode: 'record', 'replay' or None.
+    :param directory: Directory of recorded data.
+    """
+    global REPLAY_MODE, REPLAY_DIR
+    assert mode in (None, "record", "replay"), f"unknown replay mode {mode}"
+    REPLAY_MODE = mode
+    if directory is not None:
+        REPLAY_DIR = directory
+
+
+def _is_replayed(data_source: str) -> bool:
+    return REPLAY_MODE is not None and data_source != "local"
+
+
 def _get_data_reader(data_source: str) -> DataReader:
-    if data_source == "yahoo":
-        return YahooDataReader()
-    elif data_source == "naver":
-        return NaverDataReader()
-    else:
+    if data_source not in _DATA_READERS:
         raise NotImplementedError(f"DataReader for DataSource[{data_source}] is not implemented.")
+    reader = _DATA_READERS[data_source]
+    if isinstance(reader, type):
+        reader = reader()
+
+    if not _is_replayed(data_source):
+        return reader
+    directory = os.path.join(REPLAY_DIR, data_source)
+    if REPLAY_MODE == "record":
+        return RecordingDataReader(reader, directory)
+    if REPLAY_MODE == "replay":
+        return LocalDataReader(directory, reader.inclusive_end)
+    raise NotImplementedError(f"Replay mode {REPLAY_MODE} is not implemented.")
 
 
 DEFAULT_START = "1800-01-01"
 
 
+def _read_cached(reader: DataReader, tickers: list[Ticker], cache: PriceCache, start=None, end=None,
+                 actions=False, auto_adjust=True,
+                 **kwargs) -> PricePanel:
+    options = {"actions": actions, "auto_adjust": auto_adjust, **{k: repr(v) for k, v in kwargs.items()}}
+
+    # aliased tickers share the data of their symbol
+    tickers_unique = list({t.symbol: t for t in tickers}.values())
+
+    # fetch missing ranges only. tickers missing the same range are fetched together.
+    # the second round refetches the history of tickers whose cached prices turned out to be outdated.
+    for _ in range(2):
+        fetches = {}
+        for t in tickers_unique:
+            for rng in cache.missing_ranges(t, start, end, reader.inclusive_end, options):
+                fetches.setdefault(rng, []).append(t)
+
+        for (s, e), tcks in fetches.items():
+            try:
+                with profiling.stage("fetch", data_source=tcks[0].data_source, tickers=len(tcks)) as record:
+                    df = reader.read(tcks, start=s, end=e,
+                                     actions=actions, auto_adjust=auto_adjust, keepna=True,
+                                     **kwargs)
+                    record["rows"] = len(df)
+            except Exception as ex:
+                if any(cache.load_meta(t) is None for t in tcks):
+                    raise
+                print(f"ReadData: failed to fetch {[str(t) for t in tcks]} ({ex}). Use cached data.")
+                continue
+            # tickers without any column, such as delisted ones, keep their cached data
+            returned = set(df.columns.get_level_values(1)) if df.columns.nlevels > 1 else set()
+            for t in tcks:
+                if t not in returned:
+                    if cache.load_meta(t) is None:
+                        raise KeyError(f"no data of {t} is returned from {t.data_source}")
+                    print(f"ReadData: no data of {t} is returned. Use cached data.")
+                    continue
+                cache.update(t, df.xs(t, axis=1, level=1), s, e, reader.inclusive_end, options)
+
+    # read data of the period from the cache
+    data = {}
+    for t in tickers_unique:
+        df = cache.load(t)
+        if df is None:
+            continue
+        df = df.loc[pd.Timestamp(start):]
+        if end is not None:
+            df = df.loc[:pd.Timestamp(end)]
+            if not reader.inclusive_end:
+                df = df.loc[df.index < pd.Timestamp(end)]
+        data[t.symbol] = df
+
+    return PricePanel.from_symbols(data, tickers)
+
+
 def ReadData(tickers: list[Ticker], start=None, end=None,
-             actions=False, auto_adjust=True, keepna=False,
+             actions=False, auto_adjust=True, keepna=False, cache=True,
              **kwargs) -> pd.DataFrame:
+    """
+    Read daily data of tickers.
+    :param tickers: Tickers to read.
+    :param start: Start date.
+    :param end: End date.
+    :param actions: Download dividend and stock split data.
+    :param auto_adjust: Adjust all OHLC automatically.
+    :param keepna: If false, drop dates on which any data is missing.
+    :param cache: PriceCache to read data through. If True, the default cache is used. If False, always download.
+        Data sources in record/replay mode are read without the cache. See set_replay().
+    :param kwargs:
+    :return: MultiIndex DataFrame of (attribute, ticker) columns.
+    """
 
     # just for safety
     if start is None:
         start = DEFAULT_START
 
+    if cache is True:
+        cache = get_price_cache()
+
     # align tickers with their data sources
     data_sources = {}
     for t in tickers:
         data_sources.setdefault(t.data_source, []).append(t)
 
-    # read data from each data source and combine
-    df = pd.DataFrame()
-    for ds, tcks in data_sources.items():
-        df_ds = _get_data_reader(ds).read(tcks, start=start, end=end,
-                                          actions=actions, auto_adjust=auto_adjust, keepna=True,
-                                          **kwargs)
-        df = pd.concat((df, df_ds), axis=1)
+    def read(ds, tcks):
+        with profiling.stage("read_data_source", data_source=ds, tickers=len(tcks)) as record:
+            if cache and not _is_replayed(ds):
+                panel = _read_cached(_get_data_reader(ds), tcks, cache, start=start, end=end,
+                                     actions=actions, auto_adjust=auto_adjust,
+                                     **kwargs)
+            else:
+                panel = PricePanel.from_frame(_get_data_reader(ds).read(tcks, start=start, end=end,
+                                                                         actions=actions, auto_adjust=auto_adjust,
+                                                                         keepna=True,
+                                                                         **kwargs))
+            record["rows"] = len(panel)
+            return panel.to_frame()
+
+    # read data from each data source concurrently and combine
+    with ThreadPoolExecutor(max_workers=max(1, len(data_sources))) as executor:
+        dfs = list(executor.map(read, data_sources.keys(), data_sources.values()))
+    df = pd.concat([pd.DataFrame()] + dfs, axis=1)
 
     if not keepna:
         df.dropna(inplace=True)
 
-    return df.applymap(float)
+    return df
 
 
 if __name__ == "__main__":
 
     import matplotlib.pyplot as plt
 
+    from core import fx
+
     tickers = [
         SPY,
         QQQ,
@@ -158,8 +425,7 @@ if __name__ == "__main__":
         tickers + [KRW],
         keepna=True,
     )
-    df = df.apply(lambda x: x * df[(x.name[0], KRW)] if x.name[1].currency == "USD" else x)
-    df.drop(KRW, axis=1, level=1, inplace=True)
+    df = pd.concat({attr: fx.convert(df[attr], "KRW") for attr in df.columns.unique(level=0)}, axis=1)
 
     idxmin = pd.isna(df).idxmin()
     idxmax = pd.isna(df).iloc[::-1].idxmin()
@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0
+
+# maximum requests per second of each data source
+RATE_LIMITS = {
+    "yahoo": 2.0,
+    "naver": 5.0,
+}
+
+
+class RateLimiter:
+    """
+    Limit the rate of calls shared by threads.
+    """
+
+    def __init__(self, rate: float):
+        """
+        :param rate: Maximum calls per second. None or 0 means unlimited.
+        """
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(data_source: str) -> RateLimiter:
+    """
+    Get rate limiter shared by all fetches from the data source.
+    """
+    with _rate_limiters_lock:
+        if data_source not in _rate_limiters:
+            _rate_limiters[data_source] = RateLimiter(RATE_LIMITS.get(data_source))
+        return _rate_limiters[data_source]
+
+
+def retry(func, *args, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, rate_limiter: RateLimiter = None, **kwargs):
+    """
+    Call function, retrying with exponential backoff on failure.
+    :param func: Function to call.
+    :param args: Arguments of the function.
+    :param retries: Number of retries after the first failure.
+    :param backoff: Seconds to wait before the first retry. It doubles on every retry.
+    :param rate_limiter: Rate limiter applied to every call.
+    :param kwargs: Keyword arguments of the function.
+    :return: Result of the function.
+    """
+    for i in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if i == retries:
+                raise
+            print(f"retry: {e} ({i + 1}/{retries})")
+            time.sleep(backoff * 2**i)
+
+
+def fetch_all(func, items: list, max_workers=DEFAULT_MAX_WORKERS, rate_limiter: RateLimiter = None,
+              retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, progress=True) -> list:
+    """
+    Call function for each item concurrently.
+    :param func: Function to fetch an item.
+    :param items: Items to fetch.
+    :param max_workers: Maximum number of concurrent fetches.
+    :param rate_limiter: Rate limiter applied to every fetch.
+    :param retries: Number of retries of each fetch.
+    :param backoff: Seconds to wait before the first retry.
+    :param progress: If true, show progress bar.
+    :return: Results in the order of items.
+    """
+    # tqdm is imported on first use, to keep the import of data readers light
+    from tqdm import tqdm
+
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = {executor.submit(retry, func, item,
+                                   retries=retries, backoff=backoff, rate_limiter=rate_limiter): i
+                   for i, item in enumerate(items)}
+        for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+            results[futures[future]] = future.result()
+    return results
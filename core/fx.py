@@ -0,0 +1,100 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.ticker import Ticker, KRW
+
+
+# exchange rates - price of 1 unit of the first currency in the second currency
+FX_TICKERS = {
+    ("USD", "KRW"): KRW,
+}
+
+CACHE_SIZE = 16
+
+_cache = OrderedDict()
+
+
+def get_base_currency(in_krw=True, base_currency=None) -> str:
+    """
+    Get the currency to convert assets into.
+    :param in_krw: If true, convert into South Korean Won.
+    :param base_currency: Currency to convert into. Overrides in_krw.
+    :return: Base currency, or None for no conversion.
+    """
+    if base_currency is not None:
+        return base_currency
+    return "KRW" if in_krw else None
+
+
+def is_fx(ticker: Ticker) -> bool:
+    return ticker in FX_TICKERS.values() or ticker.symbol.endswith("=X")
+
+
+def fx_ticker(currency: str, base: str) -> Ticker:
+    """
+    Get ticker of the exchange rate from currency to base currency.
+    Known rates of the opposite direction are preferred, e.g. KRW=X for KRW to USD.
+    """
+    if (currency, base) in FX_TICKERS:
+        return FX_TICKERS[(currency, base)]
+    if (base, currency) in FX_TICKERS:
+        return FX_TICKERS[(base, currency)]
+    symbol = f"{base}=X" if currency == "USD" else f"{currency}{base}=X"
+    return Ticker(symbol, name=f"{currency}{base}", desc=f"{currency}/{base}", currency=base)
+
+
+def fx_tickers(tickers: list[Ticker], base: str) -> list[Ticker]:
+    """
+    Get tickers of exchange rates needed to convert assets into base currency.
+    """
+    if base is None:
+        return []
+    return sorted({fx_ticker(t.currency, base) for t in tickers if t.currency != base and not is_fx(t)})
+
+
+def convert(data: pd.DataFrame, base: str, cache=True) -> pd.DataFrame:
+    """
+    Convert prices of assets into base currency, with one multiplication per currency.
+    Results are cached per (data, base currency) unless cache is false.
+    :param data: Daily prices of assets and exchange rates to the base currency.
+    :param base: Base currency.
+    :param cache: If false, neither look up nor keep the result, e.g. for chunks of data converted only once.
+    :return: Daily prices of assets in base currency, without exchange rates.
+    """
+    values = data.to_numpy(dtype=np.float64)
+    if cache:
+        key = (base, tuple(data.columns), hash(np.asarray(data.index.values).tobytes()), hash(values.tobytes()))
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    columns = list(data.columns)
+    assets = [i for i, t in enumerate(columns) if not is_fx(t)]
+    currencies = {}
+    for i in assets:
+        currencies.setdefault(columns[i].currency, []).append(i)
+
+    converted = values.copy()
+    for currency, cols in currencies.items():
+        if currency == base:
+            continue
+        converted[:, cols] = values[:, cols] * _rate(data, currency, base)[:, np.newaxis]
+
+    df = pd.DataFrame(data=converted[:, assets], index=data.index, columns=[columns[i] for i in assets])
+    if cache:
+        _cache[key] = df
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return df
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _rate(data: pd.DataFrame, currency: str, base: str) -> np.ndarray:
+    if (currency, base) not in FX_TICKERS and (base, currency) in FX_TICKERS:
+        return 1 / data[FX_TICKERS[(base, currency)]].to_numpy(dtype=np.float64)
+    return data[fx_ticker(currency, base)].to_numpy(dtype=np.float64)
@@ -0,0 +1,83 @@
+import numpy as np
+
+
+def initial_state(shape) -> dict:
+    """
+    Get state of a portfolio before the first day.
+    :param shape: Shape of assets including batch dimensions. (..., N)
+    :return: State.
+    """
+    return {
+        "change_cum": np.ones(shape),
+        "change_cum_at_trading_day": np.ones(shape),
+        "asset_weights_at_trading_day": np.full(shape, np.nan),
+        "asset_weights_daily": np.full(shape, np.nan),
+        "total_return": np.ones(shape[:-1]),
+    }
+
+
+def simulate(change: np.ndarray, rebalance: np.ndarray, weights: np.ndarray, slippage=0.003, state: dict = None):
+    """
+    Simulate a portfolio rebalanced to target weights at trading days.
+    Leading dimensions of change and weights are batch dimensions simulated together.
+    :param change: Daily returns of assets. Without state, returns of the first day are ignored. (..., T, N)
+    :param rebalance: Increasing positions of trading days. Without state, the first one should be 0. (K,)
+    :param weights: Target weights of assets at trading days. (..., K, N)
+    :param slippage: Slippage on the traded portion of the portfolio.
+    :param state: State after the previous day returned by simulate(), to continue the simulation.
+    :return: Tuple of daily asset weights (..., T, N), total return (..., T), whether trading day (T,) and state.
+    """
+    change = np.asarray(change, dtype=np.float64)
+    rebalance = np.asarray(rebalance, dtype=np.int64)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_days = change.shape[-2]
+    if state is None:
+        state = initial_state(change.shape[:-2] + change.shape[-1:])
+    if n_days == 0:
+        return change.copy(), np.ones(change.shape[:-1]), np.zeros(0, dtype=bool), state
+
+    is_trading_day = np.zeros(n_days, dtype=bool)
+    is_trading_day[rebalance] = True
+
+    # growth of each asset since the last trading day
+    change_cum = np.cumprod(np.concatenate((state["change_cum"][..., np.newaxis, :], 1 + change), axis=-2),
+                            axis=-2)[..., 1:, :]
+    segment = np.searchsorted(rebalance, np.arange(n_days), side="right") - 1
+    before_first = segment < 0
+    segment = np.maximum(segment, 0)
+    if len(rebalance) > 0:
+        change_cum_at_trading_day = change_cum[..., rebalance[segment], :]
+        asset_weights_at_trading_day = weights[..., segment, :]
+    else:
+        change_cum_at_trading_day = np.empty_like(change_cum)
+        asset_weights_at_trading_day = np.empty_like(change_cum)
+    change_cum_at_trading_day[..., before_first, :] = state["change_cum_at_trading_day"][..., np.newaxis, :]
+    asset_weights_at_trading_day[..., before_first, :] = state["asset_weights_at_trading_day"][..., np.newaxis, :]
+    change_cum_from_trading_day = change_cum / change_cum_at_trading_day
+
+    # weights drifted by returns since the last trading day
+    asset_weights_daily = _normalize(asset_weights_at_trading_day * change_cum_from_trading_day)
+    asset_weights_prev = np.concatenate((state["asset_weights_daily"][..., np.newaxis, :],
+                                         asset_weights_daily[..., :-1, :]), axis=-2)
+    # weights drifted by returns of a day, just before rebalancing
+    asset_returned_daily = _normalize(asset_weights_prev * (1 + change))
+    asset_changed_daily = np.abs(asset_weights_daily - asset_returned_daily) * is_trading_day[:, np.newaxis]
+
+    slippage_daily = np.nansum(asset_changed_daily, axis=-1) * slippage
+    total_return = 1 + np.nansum(asset_weights_prev * change, axis=-1) - slippage_daily
+    total_return = np.cumprod(np.concatenate((state["total_return"][..., np.newaxis], total_return), axis=-1),
+                              axis=-1)[..., 1:]
+
+    state = {
+        "change_cum": change_cum[..., -1, :].copy(),
+        "change_cum_at_trading_day": change_cum_at_trading_day[..., -1, :].copy(),
+        "asset_weights_at_trading_day": asset_weights_at_trading_day[..., -1, :].copy(),
+        "asset_weights_daily": asset_weights_daily[..., -1, :].copy(),
+        "total_return": np.array(total_return[..., -1]),
+    }
+    return asset_weights_daily, total_return, is_trading_day, state
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return x / np.nansum(x, axis=-1, keepdims=True)
@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from core import kernel
+from core.strategy import Strategy, Alternatives
+
+
+class LiveTracker:
+    """
+    Incremental daily tracking of a strategy.
+    Portfolio state is kept at the day before the last trading day, which is the last day new bars can't change.
+    On update, only days after the state are simulated and asset weights are recalculated only on trading days
+    among them. Profit is identical to Strategy.analyze() on the same data.
+    """
+
+    def __init__(self, strategy: Strategy, trading_day="end", trading_price="Close", in_krw=True, path=None):
+        """
+        :param strategy: Strategy to track.
+        :param trading_day: Rebalancing day. See Strategy.get_trading_days().
+        :param trading_price: Price used when rebalancing assets.
+        :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param path: File to persist the state in.
+        """
+        self.strategy = strategy
+        self.trading_day = trading_day
+        self.trading_price = trading_price
+        self.in_krw = in_krw
+        self.path = path
+
+        self.profit = None
+        self.asset_weights = None
+        self.state = None
+        self.state_day = None
+
+    @property
+    def last_trading_day(self):
+        return None if self.asset_weights is None else self.asset_weights.index[-1]
+
+    @property
+    def current_weights(self) -> pd.Series:
+        return None if self.asset_weights is None else self.asset_weights.iloc[-1]
+
+    def update(self, data: pd.DataFrame = None, **kwargs) -> pd.DataFrame:
+        """
+        Update profit with new daily data.
+        :param data: Daily assets data. If None, read data of the strategy.
+        :param kwargs: Parameters of Strategy.read_data().
+        :return: Daily profit of the strategy.
+        """
+        if data is None:
+            data = self.strategy.read_data(self.strategy.tickers, self.trading_price, in_krw=self.in_krw, **kwargs)
+        trading_days = self.strategy.get_trading_days(data, self.trading_day)
+
+        if self.state is None:
+            asset_weights = self.strategy.calculate_asset_weights(data, trading_days)
+            first_day = asset_weights.index[0]
+        else:
+            asset_weights = self.asset_weights.loc[:self.state_day]
+            first_day = self.state_day
+
+        # calculate asset weights only if a new trading day is crossed, from the trading days within the lookback
+        trading_days_new = trading_days[trading_days > asset_weights.index[-1]]
+        if self.state is not None and len(trading_days_new) > 0:
+            trading_days_scored = trading_days[trading_days <= trading_days_new[-1]]
+            asset_weights_new = self.strategy.calculate_asset_weights(
+                data, trading_days_scored[-(self.strategy.lookback + len(trading_days_new)):])
+            asset_weights = pd.concat((asset_weights, asset_weights_new.loc[trading_days_new]))
+
+        # simulate days after the state
+        tickers_trading = asset_weights.columns
+        full_day, prices = Strategy.trading_prices(data, tickers_trading, first_day, self.in_krw)
+        change = np.zeros_like(prices)
+        change[1:] = prices[1:] / prices[:-1] - 1
+        if self.state is not None:
+            full_day, change = full_day[1:], change[1:]
+
+        asset_weights_days = asset_weights.loc[first_day:]
+        rebalance = full_day.get_indexer(asset_weights_days.index)
+        is_rebalance = rebalance >= 0
+        weights = asset_weights_days.ffill().to_numpy(dtype=np.float64)
+
+        # keep the state at the day before the last trading day
+        split = max(full_day.get_indexer(asset_weights.index[-1:])[0], 0)
+        parts = []
+        state = self.state
+        for begin, end in ((0, split), (split, len(full_day))):
+            in_part = is_rebalance & (rebalance >= begin) & (rebalance < end)
+            parts.append(kernel.simulate(change[begin:end], rebalance[in_part] - begin, weights[in_part], state=state))
+            state = parts[-1][3]
+        if split > 0:
+            self.state, self.state_day = parts[0][3], full_day[split - 1]
+
+        asset_weights_daily, total_return, is_trading_day = (np.concatenate(p) for p in list(zip(*parts))[:3])
+        profit = pd.DataFrame(data=asset_weights_daily * total_return[:, np.newaxis],
+                              index=full_day, columns=tickers_trading)
+        profit["total_return"] = total_return
+        profit["is_trading_day"] = is_trading_day
+        if isinstance(self.strategy, Alternatives):
+            profit.rename(columns=self.strategy.alternatives, inplace=True)
+
+        if self.profit is not None:
+            profit = pd.concat((self.profit.loc[:first_day], profit))
+        self.profit = profit
+        self.asset_weights = asset_weights
+
+        if self.path is not None:
+            self.save(self.path)
+        return profit
+
+    def save(self, path=None):
+        """
+        Persist the state.
+        :param path: File to persist the state in.
+        """
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        pd.to_pickle(self, path)
+
+    @staticmethod
+    def load(path) -> "LiveTracker":
+        """
+        Load persisted state.
+        :param path: File the state was persisted in.
+        :return: LiveTracker.
+        """
+        tracker = pd.read_pickle(path)
+        tracker.path = path
+        return tracker
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+
+PERIODS = 252
+
+NON_ASSET_COLUMNS = ["total_return", "is_trading_day", "cash"]
+
+ROLLING_METRICS = ["cagr", "volatility", "sharpe", "sortino", "max_drawdown", "calmar"]
+
+
+def total_returns(result: dict) -> pd.DataFrame:
+    """
+    Align total return of strategies into one matrix.
+    :param result: Daily profit of each strategy, such as the result of analyze_strategies().
+    :return: Total return of each strategy column. Dates a strategy has no data, such as holidays of its market,
+        are NaN, so that each strategy is measured over its own dates.
+    """
+    return pd.concat({str(st): profit["total_return"] for st, profit in result.items()}, axis=1).sort_index()
+
+
+def _returns(values: np.ndarray) -> np.ndarray:
+    """
+    Get daily returns of each column from its previous valid date, skipping NaN gaps rather than filling them.
+    :param values: Daily total return of each column. (T, C)
+    :return: Returns of day t at position t - 1, NaN on dates a column has no data. (T - 1, C)
+    """
+    previous = pd.DataFrame(values).ffill().to_numpy(dtype=np.float64)
+    return values[1:] / previous[:-1] - 1
+
+
+def turnovers(result: dict, periods=PERIODS) -> pd.Series:
+    """
+    Get annual turnover of strategies, the traded portion of the portfolio per year.
+    It is approximated from daily asset weights of the profit, ignoring the drift on trading days.
+    :param result: Daily profit of each strategy.
+    :param periods: Number of periods in a year.
+    :return: Annual turnover of each strategy.
+    """
+    turnover = {}
+    for st, profit in result.items():
+        assets = profit.drop(columns=NON_ASSET_COLUMNS, errors="ignore").to_numpy(dtype=np.float64)
+        weights = np.nan_to_num(assets / profit["total_return"].to_numpy(dtype=np.float64)[:, np.newaxis])
+        traded = np.abs(np.diff(weights, axis=0)).sum(axis=1) / 2
+        is_trading_day = profit["is_trading_day"].to_numpy(dtype=bool)[1:]
+        turnover[str(st)] = traded[is_trading_day].sum() / max(len(profit) - 1, 1) * periods
+    return pd.Series(turnover)
+
+
+def summarize(total_return: pd.DataFrame, periods=PERIODS, rf=0.0) -> pd.DataFrame:
+    """
+    Get summary metrics of all strategies in a single pass over the aligned matrix.
+    Each column is measured over its own dates, and the moments count only its own returns.
+    :param total_return: Daily total return of each strategy column, such as the result of total_returns().
+    :param periods: Number of periods in a year.
+    :param rf: Annual risk-free rate.
+    :return: Metrics of each strategy row.
+    """
+    values = total_return.to_numpy(dtype=np.float64)
+    index = total_return.index
+    is_valid = ~np.isnan(values)
+    first = is_valid.argmax(axis=0)
+    last = len(values) - 1 - is_valid[::-1].argmax(axis=0)
+    cols = np.arange(values.shape[1])
+
+    returns = _returns(values)
+    excess = returns - rf / periods
+    mean = np.nanmean(excess, axis=0)
+    std = np.nanstd(returns, axis=0, ddof=1)
+    downside = np.sqrt(np.nanmean(np.minimum(excess, 0) ** 2, axis=0))
+
+    # running max is O(n), NaN before the first date is ignored
+    drawdown = values / np.fmax.accumulate(values, axis=0) - 1
+    max_drawdown = np.nanmin(drawdown, axis=0)
+
+    tr = values[last, cols] / values[first, cols]
+    return from_statistics(index[first], index[last], tr, mean, std, downside, max_drawdown, periods,
+                           total_return.columns)
+
+
+def from_statistics(start: pd.DatetimeIndex, end: pd.DatetimeIndex, tr: np.ndarray, mean: np.ndarray,
+                    std: np.ndarray, downside: np.ndarray, max_drawdown: np.ndarray, periods=PERIODS,
+                    index=None) -> pd.DataFrame:
+    """
+    Get summary metrics from statistics of daily returns.
+    :param start: First date of each series.
+    :param end: Last date of each series.
+    :param tr: Total return.
+    :param mean: Mean of daily excess returns.
+    :param std: Standard deviation of daily returns.
+    :param downside: Root mean square of negative daily excess returns.
+    :param max_drawdown: Max drawdown.
+    :param periods: Number of periods in a year.
+    :param index: Index of the result.
+    :return: Metrics of each series row.
+    """
+    years = (end - start).days.to_numpy() / 365.25
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cagr = np.where(years > 0, tr ** (1 / years) - 1, np.nan)
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods), np.nan)
+        sortino = np.where(downside > 0, mean / downside * np.sqrt(periods), np.nan)
+        calmar = np.where(max_drawdown < 0, cagr / -max_drawdown, np.nan)
+
+    return pd.DataFrame({
+        "start": start,
+        "end": end,
+        "total_return": tr,
+        "cagr": cagr,
+        "volatility": std * np.sqrt(periods),
+        "sharpe": sharpe,
+        "sortino": sortino,
+        "max_drawdown": max_drawdown,
+        "calmar": calmar,
+    }, index=index)
+
+
+def rolling(total_return: pd.DataFrame, window=PERIODS, periods=PERIODS, rf=0.0) -> dict:
+    """
+    Get rolling metrics of all strategies. Windows are updated online, O(n) for each metric.
+    Each column rolls over its own dates, so a window is the number of days the strategy has data.
+    :param total_return: Daily total return of each strategy column, such as the result of total_returns().
+    :param window: Window size in days.
+    :param periods: Number of periods in a year.
+    :param rf: Annual risk-free rate.
+    :return: Rolling metrics, a DataFrame of strategy columns for each metric. NaN on dates a strategy has no data.
+    """
+    by_column = {col: _rolling(total_return[col].dropna(), window, periods, rf) for col in total_return.columns}
+    result = {}
+    for metric in ROLLING_METRICS:
+        df = pd.concat({col: r[metric] for col, r in by_column.items()}, axis=1)
+        result[metric] = df.reindex(index=total_return.index, columns=total_return.columns)
+    return result
+
+
+def _rolling(total_return: pd.Series, window: int, periods: int, rf: float) -> dict:
+    returns = total_return / total_return.shift(1) - 1
+    excess = returns - rf / periods
+    mean = excess.rolling(window).mean()
+    std = returns.rolling(window).std()
+    downside = np.sqrt((np.minimum(excess, 0) ** 2).rolling(window).mean())
+    # worst drawdown from the running max during the window
+    max_drawdown = (total_return / total_return.cummax() - 1).rolling(window).min()
+    cagr = (total_return / total_return.shift(window)) ** (periods / window) - 1
+    return {
+        "cagr": cagr,
+        "volatility": std * np.sqrt(periods),
+        "sharpe": (mean / std * np.sqrt(periods)).where(std > 0),
+        "sortino": (mean / downside * np.sqrt(periods)).where(downside > 0),
+        "max_drawdown": max_drawdown,
+        "calmar": (cagr / -max_drawdown).where(max_drawdown < 0),
+    }
+
+
+def table(result: dict, periods=PERIODS, rf=0.0) -> pd.DataFrame:
+    """
+    Get summary metrics and turnover of strategies.
+    :param result: Daily profit of each strategy, such as the result of analyze_strategies().
+    :param periods: Number of periods in a year.
+    :param rf: Annual risk-free rate.
+    :return: Metrics of each strategy row.
+    """
+    df = summarize(total_returns(result), periods, rf)
+    df["turnover"] = turnovers(result, periods)
+    return df
+
+
+def save(df: pd.DataFrame, path: str, decimals=6):
+    """
+    Save metrics in a compact form that is cheap to diff between runs.
+    :param df: Metrics, such as the result of table().
+    :param path: File path. Saved as parquet if it ends with .parquet, otherwise as CSV.
+    :param decimals: Number of decimals to round to.
+    """
+    df = df.round(decimals)
+    if path.endswith(".parquet"):
+        df.to_parquet(path)
+    else:
+        df.to_csv(path)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from core.ticker import Ticker
+
+
+class PricePanel:
+    """
+    Daily data of tickers in a contiguous (attribute x date x symbol) array.
+    Tickers are interned to integer positions of their (data source, symbol), so aliased tickers sharing a symbol
+    such as EFA and EFA_H are zero-copy views of the same data.
+    """
+
+    def __init__(self, values: np.ndarray, attributes: list[str], index: pd.DatetimeIndex,
+                 symbols: list[tuple], tickers: list[Ticker]):
+        """
+        :param values: Data of each symbol. (attribute, date, symbol)
+        :param attributes: Attributes such as Close and Volume.
+        :param index: Dates.
+        :param symbols: (data source, symbol) of each position of the last axis.
+        :param tickers: Tickers, each of which is one of the symbols. Other tickers of the symbols are also accessible.
+        """
+        assert values.shape == (len(attributes), len(index), len(symbols)), "shape mismatch"
+        self.values = values
+        self.attributes = list(attributes)
+        self.index = index
+        self.symbols = list(symbols)
+        self.tickers = list(tickers)
+
+        self._attribute_positions = {a: i for i, a in enumerate(self.attributes)}
+        self._symbol_positions = {s: i for i, s in enumerate(self.symbols)}
+        self.positions = self.get_positions(self.tickers)
+
+    @classmethod
+    def from_symbols(cls, data: dict, tickers: list[Ticker], attributes: list[str] = None,
+                     dtype=np.float64) -> "PricePanel":
+        """
+        Build a panel from data of each symbol.
+        :param data: DataFrame of attribute columns for each symbol. Symbols without data are filled with NaN.
+        :param tickers: Tickers.
+        :param attributes: Attributes. If None, all attributes of the data sorted.
+        :param dtype: Data type of the storage. float32 halves the memory.
+        :return: PricePanel.
+        """
+        symbols = list(dict.fromkeys((t.data_source, t.symbol) for t in tickers))
+        if attributes is None:
+            attributes = sorted(set().union(*[df.columns for df in data.values()]))
+        index = pd.DatetimeIndex([])
+        for df in data.values():
+            index = index.union(df.index)
+        index = index.rename("Date")
+
+        values = np.full((len(attributes), len(index), len(symbols)), np.nan, dtype=dtype)
+        for i, (_, symbol) in enumerate(symbols):
+            if symbol not in data:
+                continue
+            df = data[symbol].reindex(index=index, columns=attributes)
+            values[:, :, i] = df.to_numpy(dtype=dtype).T
+        return cls(values, attributes, index, symbols, tickers)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype=np.float64) -> "PricePanel":
+        """
+        Build a panel from a MultiIndex DataFrame of (attribute, ticker) columns, such as the result of ReadData.
+        :param df: MultiIndex DataFrame.
+        :param dtype: Data type of the storage. float32 halves the memory.
+        :return: PricePanel.
+        """
+        attributes = list(df.columns.unique(level=0))
+        tickers = list(df.columns.unique(level=1))
+        symbols = list(dict.fromkeys((t.data_source, t.symbol) for t in tickers))
+        first = {}
+        for t in tickers:
+            first.setdefault((t.data_source, t.symbol), t)
+
+        columns = pd.MultiIndex.from_product([attributes, [first[s] for s in symbols]])
+        values = df.reindex(columns=columns).to_numpy(dtype=dtype)
+        values = np.ascontiguousarray(values.reshape(len(df.index), len(attributes), len(symbols)).transpose(1, 0, 2))
+        return cls(values, attributes, df.index, symbols, tickers)
+
+    def get_positions(self, tickers: list[Ticker]) -> np.ndarray:
+        """
+        Get positions of tickers in the last axis of values. Aliased tickers share the same position.
+        :param tickers: Tickers of the symbols in the panel.
+        :return: Positions.
+        """
+        return np.array([self._symbol_positions[(t.data_source, t.symbol)] for t in tickers], dtype=np.int64)
+
+    def to_frame(self, tickers: list[Ticker] = None) -> pd.DataFrame:
+        """
+        Get a MultiIndex DataFrame of (attribute, ticker) columns, the layout of ReadData.
+        :param tickers: Tickers. If None, all tickers.
+        :return: MultiIndex DataFrame.
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        values = self.values[:, :, self.get_positions(tickers)].transpose(1, 0, 2)
+        # explicit shape, as an empty panel can't infer it
+        values = values.reshape(len(self.index), len(self.attributes) * len(tickers))
+        columns = pd.MultiIndex.from_product([self.attributes, tickers])
+        return pd.DataFrame(data=values, index=self.index, columns=columns)
+
+    def frame(self, attribute: str, tickers: list[Ticker] = None) -> pd.DataFrame:
+        """
+        Get a DataFrame of an attribute, same as to_frame()[attribute].
+        :param attribute: Attribute such as Close.
+        :param tickers: Tickers. If None, all tickers.
+        :return: DataFrame of ticker columns.
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        return pd.DataFrame(data=self.prices(attribute, tickers), index=self.index, columns=tickers)
+
+    def prices(self, attribute: str, tickers: list[Ticker] = None) -> np.ndarray:
+        """
+        Get values of an attribute.
+        :param attribute: Attribute such as Close.
+        :param tickers: Tickers. If None, all tickers.
+        :return: Values. (date, ticker)
+        """
+        positions = self.positions if tickers is None else self.get_positions(tickers)
+        return self.values[self._attribute_positions[attribute]][:, positions]
+
+    def get(self, attribute: str, ticker: Ticker) -> np.ndarray:
+        """
+        Get values of an attribute of a ticker without copy. Aliased tickers share the same memory.
+        :param attribute: Attribute such as Close.
+        :param ticker: Ticker.
+        :return: View of the values. (date,)
+        """
+        position = self._symbol_positions[(ticker.data_source, ticker.symbol)]
+        return self.values[self._attribute_positions[attribute], :, position]
+
+    def loc(self, start=None, end=None) -> "PricePanel":
+        """
+        Get a panel of the period without copy.
+        :param start: Start date.
+        :param end: End date, inclusive.
+        :return: PricePanel.
+        """
+        begin, stop = self.index.slice_indexer(start, end).indices(len(self.index))[:2]
+        return PricePanel(self.values[:, begin:stop], self.attributes, self.index[begin:stop],
+                          self.symbols, self.tickers)
+
+    def dropna(self) -> "PricePanel":
+        """
+        Drop dates on which any data is missing.
+        :return: PricePanel.
+        """
+        used = np.unique(self.positions)
+        is_valid = ~np.isnan(self.values[:, :, used]).any(axis=(0, 2))
+        if is_valid.all():
+            return self
+        return PricePanel(self.values[:, is_valid], self.attributes, self.index[is_valid],
+                          self.symbols, self.tickers)
+
+    def astype(self, dtype) -> "PricePanel":
+        return PricePanel(self.values.astype(dtype), self.attributes, self.index, self.symbols, self.tickers)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def __len__(self):
+        return len(self.index)
+
+    def __repr__(self):
+        return (f"PricePanel({len(self.attributes)} attributes x {len(self.index)} dates x "
+                f"{len(self.tickers)} tickers ({len(self.symbols)} symbols), {self.values.dtype})")
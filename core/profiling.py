@@ -0,0 +1,175 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+
+class Profiler:
+    """
+    Records wall time, rows processed and peak memory of stages.
+    Peak memory is traced by tracemalloc, relative to the memory in use when a stage starts.
+    As tracemalloc is process-wide, memory is traced for stages on the main thread only, including allocations of
+    threads they wait for. Stages on other threads, such as concurrent reads of data sources, record None.
+    """
+
+    def __init__(self, memory=True):
+        """
+        :param memory: If true, trace peak memory. It slows down allocations.
+        """
+        self.memory = memory
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str, strategy=None, **info):
+        stack = self._local.__dict__.setdefault("stack", [])
+        record = {"stage": name, "strategy": None if strategy is None else str(strategy), "rows": None, **info}
+        tracing = self.memory and tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread()
+        if self.memory and not tracing:
+            record["peak_memory"] = None
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            # keep the peak of the enclosing stage before resetting it for this stage
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+            record["_current"], record["_peak"] = current, current
+        stack.append(record)
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["wall"] = time.perf_counter() - start
+            stack.pop()
+            if tracing:
+                peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                record["peak_memory"] = peak - record.pop("_current")
+                if stack:
+                    stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+            with self._lock:
+                self.records.append(record)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Get summary of stages of each strategy.
+        :return: Count, total and mean wall time, rows and maximum peak memory of each (stage, strategy).
+        """
+        if not self.records:
+            return pd.DataFrame()
+        df = pd.DataFrame(self.records)
+        if "peak_memory" not in df:
+            df["peak_memory"] = float("nan")
+        df["strategy"] = df["strategy"].fillna("")
+        summary = df.groupby(["stage", "strategy"], sort=False).agg(
+            count=("wall", "size"),
+            wall=("wall", "sum"),
+            wall_mean=("wall", "mean"),
+            rows=("rows", "sum"),
+            peak_memory=("peak_memory", "max"),
+        )
+        return summary.sort_values("wall", ascending=False)
+
+    def print_summary(self):
+        summary = self.summary()
+        if summary.empty:
+            return
+        summary = summary.assign(peak_memory=summary["peak_memory"] / 2 ** 20).rename(
+            columns={"peak_memory": "peak_memory_mb"})
+        print("******** Profile ********")
+        print(summary.to_string(float_format=lambda x: f"{x:.4f}"))
+        print()
+
+    def export(self, path: str):
+        """
+        Export records into a JSON file, for tracking trends across runs.
+        :param path: File path.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"created_at": datetime.now().isoformat(), "records": self.records}, f, indent=2, default=str)
+
+
+# profiler enabled by QUANT_PROFILE. If it ends with .json, records are exported into the file.
+PROFILE = os.environ.get("QUANT_PROFILE", "")
+
+_profiler = None
+
+
+def get_profiler() -> Profiler:
+    """
+    Get the active profiler. It is created on first use if QUANT_PROFILE is set.
+    :return: Profiler, or None if profiling is disabled.
+    """
+    global _profiler
+    if _profiler is None and PROFILE not in ("", "0"):
+        _profiler = Profiler()
+        _profiler.start()
+    return _profiler
+
+
+@contextlib.contextmanager
+def profile(memory=True, path: str = None):
+    """
+    Profile stages in the context. Summary is printed at the end.
+    :param memory: If true, trace peak memory.
+    :param path: JSON file to export records into.
+    """
+    global _profiler
+    previous = _profiler
+    _profiler = Profiler(memory)
+    _profiler.start()
+    try:
+        yield _profiler
+    finally:
+        profiler, _profiler = _profiler, previous
+        profiler.stop()
+        profiler.print_summary()
+        if path is not None:
+            profiler.export(path)
+
+
+@contextlib.contextmanager
+def stage(name: str, strategy=None, **info):
+    """
+    Record a stage if profiling is enabled, otherwise do nothing.
+    Set "rows" of the yielded record to the number of rows processed.
+    :param name: Name of the stage.
+    :param strategy: Strategy of the stage.
+    :param info: Other information of the stage, such as data source.
+    """
+    profiler = get_profiler()
+    if profiler is None:
+        yield {}
+        return
+    with profiler.stage(name, strategy, **info) as record:
+        yield record
+
+
+def report():
+    """
+    Print summary of the profiler enabled by QUANT_PROFILE, and export it if QUANT_PROFILE is a JSON file.
+    Profilers of profile() report by themselves.
+    """
+    if _profiler is None or PROFILE in ("", "0"):
+        return
+    _profiler.print_summary()
+    if PROFILE.endswith(".json"):
+        _profiler.export(PROFILE)
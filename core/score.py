@@ -1,24 +1,99 @@
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
 
 
+class ScoreEngine:
+    """
+    Lookback returns and rolling means of assets, cached with LRU eviction.
+    Each asset is cached on its own by (ticker, rebalancing calendar, last date), so strategies sharing an asset on
+    the same calendar share its lookback returns and any weighted combination of them. An entry keeps the prices it
+    was computed from, and is recomputed if they changed.
+    """
+
+    def __init__(self, maxsize=4096):
+        """
+        :param maxsize: Maximum number of cached (asset, statistic) entries.
+        """
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def returns(self, data: pd.DataFrame, period: int) -> pd.DataFrame:
+        """
+        Get returns over the lookback period.
+        :param data: Prices of assets at rebalancing days.
+        :param period: Lookback period in rows.
+        :return: Returns, same as data.pct_change(periods=period).
+        """
+        return self._get(data, ("returns", period), lambda x: x.pct_change(periods=period))
+
+    def sma(self, data: pd.DataFrame, window: int) -> pd.DataFrame:
+        """
+        Get simple moving averages.
+        :param data: Prices of assets at rebalancing days.
+        :param window: Window size in rows.
+        :return: Moving averages, same as data.rolling(window=window).mean().
+        """
+        return self._get(data, ("sma", window), lambda x: x.rolling(window=window).mean())
+
+    def weighted_returns(self, data: pd.DataFrame, weights: dict) -> pd.DataFrame:
+        """
+        Get weighted sum of lookback returns.
+        :param data: Prices of assets at rebalancing days.
+        :param weights: Weight of each lookback period.
+        :return: Weighted sum of returns. Rows without all returns are dropped.
+        """
+        score = None
+        for period, weight in weights.items():
+            m = self.returns(data, period)
+            m = m if weight == 1 else weight * m
+            score = m if score is None else score + m
+        return score.dropna(axis=0)
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, data: pd.DataFrame, stat: tuple, func) -> pd.DataFrame:
+        # rebalancing calendar of the data, identified by its first date and number of dates
+        index = data.index
+        calendar = (index[0], len(index)) if len(index) > 0 else (None, 0)
+        last = index[-1] if len(index) > 0 else None
+        columns = {}
+        for col in data.columns:
+            x = data[col]
+            values = x.to_numpy()
+            key = (col, calendar, last, stat)
+            entry = self.cache.get(key)
+            # prices of the same dates differ by trading price or updated bars, so the entry is checked against them
+            if entry is not None and np.array_equal(entry[0], values, equal_nan=True):
+                self.hits += 1
+            else:
+                entry = (values.copy(), func(x).to_numpy())
+                self.cache[key] = entry
+                self.misses += 1
+            self.cache.move_to_end(key)
+            if len(self.cache) > self.maxsize:
+                self.cache.popitem(last=False)
+            columns[col] = entry[1]
+        return pd.DataFrame(data=columns, index=data.index, columns=data.columns)
+
+
+score_engine = ScoreEngine()
+
+
 def score_13612U(data: pd.DataFrame) -> pd.DataFrame:
-    m1 = data.pct_change(periods=1)
-    m3 = data.pct_change(periods=3)
-    m6 = data.pct_change(periods=6)
-    m12 = data.pct_change(periods=12)
-    score = (m1 + m3 + m6 + m12).dropna(axis=0)
-    return score
+    return score_engine.weighted_returns(data, {1: 1, 3: 1, 6: 1, 12: 1})
 
 
 def score_13612W(data: pd.DataFrame) -> pd.DataFrame:
-    m1 = data.pct_change(periods=1)
-    m3 = data.pct_change(periods=3)
-    m6 = data.pct_change(periods=6)
-    m12 = data.pct_change(periods=12)
-    score = (12 * m1 + 4 * m3 + 2 * m6 + 1 * m12).dropna(axis=0)
-    return score
+    return score_engine.weighted_returns(data, {1: 12, 3: 4, 6: 2, 12: 1})
 
 
 def score_SMA12(data: pd.DataFrame) -> pd.DataFrame:
-    score = (data / data.rolling(window=13).mean() - 1).dropna(axis=0)
-    return score
\ No newline at end of file
+    score = (data / score_engine.sma(data, 13) - 1).dropna(axis=0)
+    return score
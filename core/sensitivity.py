@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from core import kernel, metrics
+from core.strategy import Strategy
+from core.universe import Universe
+
+
+TRADING_DAYS = list(range(1, 32)) + ["begin", "end"]
+
+
+def rebalance_sensitivity(strategy: Strategy, trading_days: list = None, trading_price="Close", start=None, end=None,
+                          in_krw=True, slippage=0.003, base_currency=None, universe: Universe = None,
+                          **kwargs) -> pd.DataFrame:
+    """
+    Get daily total return of a strategy for each rebalancing day, simulated together in one batch.
+    Data is read and converted once, and every variant shares the daily asset returns. The kernel runs all
+    variants on the union of their trading days: on a day that is not its own, a variant rebalances to the
+    weights it has drifted to, which trades nothing. Results match analyze() of each variant up to rounding.
+    :param strategy: Strategy.
+    :param trading_days: Rebalancing days to compare. By default, all days of month, 'begin' and 'end'.
+    :param trading_price: Price used when rebalancing assets.
+    :param start: Start date of analyzing period.
+    :param end: End date of analyzing period.
+    :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+    :param slippage: Slippage on the traded portion of the portfolio.
+    :param base_currency: Currency to convert assets into. Overrides in_krw.
+    :param universe: Universe the data is read from. Loaded for the strategy if not given.
+    :param kwargs: Other parameters of Strategy.calculate_asset_weights.
+    :return: Total return of each rebalancing day column, NaN before its first trading day.
+    """
+    trading_days = TRADING_DAYS if trading_days is None else list(trading_days)
+    if universe is None:
+        universe = Universe.from_strategies([strategy], in_krw, base_currency).load(start=start, end=end)
+    data = strategy.read_data(strategy.tickers, trading_price, start, end, in_krw, universe=universe,
+                              base_currency=base_currency)
+
+    asset_weights = [strategy.calculate_asset_weights(data, strategy.get_trading_days(data, td), **kwargs)
+                     for td in trading_days]
+    # prices from the earliest first trading day are shared by all variants
+    earliest = int(np.argmin([aw.index[0] for aw in asset_weights]))
+    full_day, _, change, _, _ = strategy.simulation_inputs(data, asset_weights[earliest], in_krw, base_currency,
+                                                           trading_price, universe)
+
+    rebalances, weights = [], []
+    for aw in asset_weights:
+        rebalance = full_day.get_indexer(aw.index)
+        is_rebalance = rebalance >= 0
+        rebalances.append(rebalance[is_rebalance])
+        weights.append(aw.ffill().to_numpy(dtype=np.float64)[is_rebalance])
+
+    union = np.unique(np.concatenate(rebalances))
+    change_cum = np.cumprod(1 + change, axis=0)
+    weights_union = np.stack([_drifted_weights(r, w, union, change_cum) for r, w in zip(rebalances, weights)])
+
+    _, total_return, _, _ = kernel.simulate(np.broadcast_to(change, (len(trading_days),) + change.shape), union,
+                                            weights_union, slippage)
+    for i, rebalance in enumerate(rebalances):
+        total_return[i, :rebalance[0]] = np.nan
+    return pd.DataFrame(data=total_return.T, index=full_day,
+                        columns=pd.Index(trading_days, dtype=object, name="trading_day"))
+
+
+def _drifted_weights(rebalance: np.ndarray, weights: np.ndarray, union: np.ndarray,
+                     change_cum: np.ndarray) -> np.ndarray:
+    # target weights of a variant at its own trading days, weights drifted since then at the other days,
+    # and NaN before its first trading day. The kernel normalizes them.
+    segment = np.searchsorted(rebalance, union, side="right") - 1
+    before_first = segment < 0
+    segment = np.maximum(segment, 0)
+    drifted = weights[segment] * (change_cum[union] / change_cum[rebalance[segment]])
+    drifted[before_first] = np.nan
+    return drifted
+
+
+def summarize(total_return: pd.DataFrame, periods=metrics.PERIODS, rf=0.0) -> pd.DataFrame:
+    """
+    Get summary metrics of each rebalancing day, with its deviation from the median of all days.
+    :param total_return: Total return of each rebalancing day column, such as the result of rebalance_sensitivity().
+    :param periods: Number of periods in a year.
+    :param rf: Annual risk-free rate.
+    :return: Metrics of each rebalancing day row.
+    """
+    summary = metrics.summarize(total_return, periods, rf)
+    summary["cagr_vs_median"] = summary["cagr"] - summary["cagr"].median()
+    return summary
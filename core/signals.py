@@ -0,0 +1,91 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.strategy import Strategy
+from core.universe import Universe
+
+
+# history kept in memory, enough for the lookback of monthly strategies
+DEFAULT_HISTORY = pd.DateOffset(years=2)
+
+
+class SignalService:
+    """
+    Current target weights of strategies, the latest row of Strategy.calculate_asset_weights().
+    Price data is kept in memory, and only the trading days within the lookback of a strategy are scored, so the
+    current weights are answered in milliseconds without the daily backtest. Answers are memoized until reloaded.
+    """
+
+    def __init__(self, strategies: list[Strategy], trading_day="end", trading_price="Close", in_krw=True,
+                 base_currency=None, history=DEFAULT_HISTORY):
+        """
+        :param strategies: Strategies to serve.
+        :param trading_day: Rebalancing day. See Strategy.get_trading_days().
+        :param trading_price: Price used when rebalancing assets.
+        :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :param history: Length of history to keep in memory.
+        """
+        self.strategies = {str(st): st for st in strategies}
+        self.trading_day = trading_day
+        self.trading_price = trading_price
+        self.in_krw = in_krw
+        self.base_currency = base_currency
+        self.history = history
+        self.universe = Universe.from_strategies(strategies, in_krw, base_currency)
+        self.loaded_at = None
+        self._data = {}
+        self._weights = {}
+        self._lock = threading.Lock()
+
+    def load(self, end=None, **kwargs) -> "SignalService":
+        """
+        Read price data of all strategies into memory.
+        :param end: Last date. If None, up to date.
+        :param kwargs: Parameters of ReadData, such as cache.
+        :return: self
+        """
+        start = (pd.Timestamp.today() if end is None else pd.Timestamp(end)).normalize() - self.history
+        with self._lock:
+            self.universe.load(start=start, end=end, **kwargs)
+            self._data = {}
+            self._weights = {}
+            self.loaded_at = pd.Timestamp.now()
+        return self
+
+    def current_weights(self, name: str) -> dict:
+        """
+        Get the current target weights of a strategy.
+        :param name: Name of the strategy.
+        :return: Trading day, date of the data scored and target weights of assets.
+        """
+        if name not in self.strategies:
+            raise KeyError(f"Strategy[{name}] is not served")
+        if self.loaded_at is None:
+            self.load()
+        with self._lock:
+            if name not in self._weights:
+                self._weights[name] = self._calculate(self.strategies[name])
+            return self._weights[name]
+
+    def _calculate(self, strategy: Strategy) -> dict:
+        if strategy not in self._data:
+            self._data[strategy] = strategy.read_data(strategy.tickers, self.trading_price, in_krw=self.in_krw,
+                                                      universe=self.universe, base_currency=self.base_currency)
+        data = self._data[strategy]
+        trading_days = strategy.get_trading_days(data, self.trading_day)
+        if len(trading_days) <= strategy.lookback:
+            raise ValueError(f"{len(trading_days)} trading days are not enough for Strategy[{strategy}]")
+
+        # the latest weights only depend on the trading days within the lookback
+        asset_weights = strategy.calculate_asset_weights(data, trading_days[-strategy.lookback - 1:])
+        weights = asset_weights.iloc[-1]
+        position = data.index.get_loc(weights.name)
+        return {
+            "strategy": str(strategy),
+            "trading_day": weights.name,
+            "scored_on": data.index[position - 1] if strategy.lookback > 0 and position > 0 else weights.name,
+            "weights": {t: float(w) for t, w in weights.items() if not np.isnan(w)},
+        }
@@ -0,0 +1,218 @@
+import math
+
+import numpy as np
+
+from core.ticker import Ticker
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _jit(func):
+    # compiled by numba if it is installed, otherwise run as Python
+    return func if numba is None else numba.njit(cache=True)(func)
+
+
+def slippage_rates(slippage, tickers: list[Ticker]) -> np.ndarray:
+    """
+    Get slippage rate of each asset.
+    :param slippage: A rate for all assets, or rates by Ticker or by currency such as {'KRW': 0.001, 'USD': 0.003}.
+        A rate of a ticker takes precedence over a rate of its currency.
+    :param tickers: Trading assets.
+    :return: Slippage rates. (N,)
+    """
+    if not isinstance(slippage, dict):
+        return np.full(len(tickers), slippage, dtype=np.float64)
+    rates = []
+    for t in tickers:
+        if t in slippage:
+            rates.append(slippage[t])
+        elif t.currency in slippage:
+            rates.append(slippage[t.currency])
+        else:
+            raise KeyError(f"slippage of {t} is not given")
+    return np.array(rates, dtype=np.float64)
+
+
+def simulate(change: np.ndarray, rebalance: np.ndarray, weights: np.ndarray, slippage=0.003, band: float = None,
+             daily=False, prices: np.ndarray = None, capital: float = None):
+    """
+    Simulate a portfolio day by day, for rules depending on the path of the portfolio.
+    In calendar mode, without band and capital, it is identical to core.kernel.simulate().
+    :param change: Daily returns of assets. Returns of the first day are ignored. (T, N)
+    :param rebalance: Increasing positions of trading days, when target weights are updated. The first one is 0. (K,)
+    :param weights: Target weights of assets at trading days. (K, N)
+    :param slippage: Slippage on the traded portion of the portfolio, a rate for all assets or rates of assets. (N,)
+    :param band: If given, rebalance only when the weight of any asset drifts from its target by more than it.
+        Weights are still rebalanced to new targets whenever they drift out of the band.
+    :param daily: If true, check the band every day. Otherwise, check it at trading days only.
+    :param prices: Daily prices of assets, required with capital. (T, N)
+    :param capital: If given, hold whole shares bought with the capital. The rest is kept as cash.
+    :return: Tuple of daily asset weights (T, N), total return (T,), whether rebalanced (T,) and cash weight (T,).
+    """
+    change = np.ascontiguousarray(change, dtype=np.float64)
+    rebalance = np.ascontiguousarray(rebalance, dtype=np.int64)
+    weights = np.ascontiguousarray(weights, dtype=np.float64)
+    rates = np.ascontiguousarray(np.broadcast_to(np.asarray(slippage, dtype=np.float64), change.shape[-1:]))
+    # a single rate is applied to the sum of traded weights, as in the kernel
+    uniform = bool((rates == rates[0]).all()) if len(rates) > 0 else True
+    band = -1.0 if band is None else float(band)
+
+    if capital is None:
+        return _simulate_weights(change, rebalance, weights, rates, uniform, band, daily)
+    assert prices is not None, "prices are required to hold whole shares"
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    return _simulate_shares(prices, rebalance, weights, rates, band, daily, float(capital))
+
+
+@_jit
+def _sum(x):
+    # sum ignoring NaN, in the same order as the pairwise summation of numpy
+    n = len(x)
+    if n < 8:
+        res = 0.0
+        for i in range(n):
+            if not math.isnan(x[i]):
+                res += x[i]
+        return res
+    if n > 128:
+        half = n // 2
+        half -= half % 8
+        return _sum(x[:half]) + _sum(x[half:])
+    r = np.zeros(8)
+    for j in range(8):
+        if not math.isnan(x[j]):
+            r[j] = x[j]
+    i = 8
+    while i < n - n % 8:
+        for j in range(8):
+            if not math.isnan(x[i + j]):
+                r[j] += x[i + j]
+        i += 8
+    res = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+    while i < n:
+        if not math.isnan(x[i]):
+            res += x[i]
+        i += 1
+    return res
+
+
+@_jit
+def _normalize(x):
+    return x / _sum(x)
+
+
+@_jit
+def _out_of_band(weights, target, band):
+    # no weights yet, or any asset drifted out of the band
+    target = _normalize(target)
+    is_out = True
+    for i in range(len(weights)):
+        if not math.isnan(weights[i]):
+            is_out = False
+            break
+    for i in range(len(weights)):
+        if abs(weights[i] - target[i]) > band:
+            return True
+    return is_out
+
+
+@_jit
+def _simulate_weights(change, rebalance, weights, rates, uniform, band, daily):
+    n_days, n_assets = change.shape
+    asset_weights_daily = np.empty((n_days, n_assets))
+    total_return = np.empty(n_days)
+    is_trading_day = np.zeros(n_days, dtype=np.bool_)
+
+    change_cum = np.ones(n_assets)
+    change_cum_at_trading_day = np.ones(n_assets)
+    asset_weights_at_trading_day = np.full(n_assets, np.nan)
+    weights_prev = np.full(n_assets, np.nan)
+    target = np.full(n_assets, np.nan)
+    tr = 1.0
+    k = 0
+    for t in range(n_days):
+        growth = 1 + change[t]
+        change_cum *= growth
+
+        is_target_day = k < len(rebalance) and rebalance[k] == t
+        if is_target_day:
+            target = weights[k]
+            k += 1
+        # weights drifted by returns since the last trading day
+        drifted = _normalize(asset_weights_at_trading_day * (change_cum / change_cum_at_trading_day))
+        if band < 0:
+            is_rebalanced = is_target_day
+        else:
+            is_rebalanced = (is_target_day or (daily and k > 0)) and _out_of_band(drifted, target, band)
+
+        if is_rebalanced:
+            asset_weights_at_trading_day = target.copy()
+            change_cum_at_trading_day = change_cum.copy()
+            weights_today = _normalize(target * (change_cum / change_cum_at_trading_day))
+            # weights drifted by returns of a day, just before rebalancing
+            changed = np.abs(weights_today - _normalize(weights_prev * growth))
+            slippage = _sum(changed) * rates[0] if uniform else _sum(changed * rates)
+        else:
+            weights_today = drifted
+            slippage = 0.0
+
+        tr *= 1 + _sum(weights_prev * change[t]) - slippage
+        asset_weights_daily[t] = weights_today
+        total_return[t] = tr
+        is_trading_day[t] = is_rebalanced
+        weights_prev = weights_today
+    return asset_weights_daily, total_return, is_trading_day, np.zeros(n_days)
+
+
+@_jit
+def _simulate_shares(prices, rebalance, weights, rates, band, daily, capital):
+    n_days, n_assets = prices.shape
+    asset_weights_daily = np.empty((n_days, n_assets))
+    total_return = np.empty(n_days)
+    is_trading_day = np.zeros(n_days, dtype=np.bool_)
+    cash_weight = np.empty(n_days)
+
+    shares = np.zeros(n_assets)
+    cash = capital
+    target = np.full(n_assets, np.nan)
+    k = 0
+    for t in range(n_days):
+        holdings = shares * prices[t]
+        value = _sum(holdings) + cash
+
+        is_target_day = k < len(rebalance) and rebalance[k] == t
+        if is_target_day:
+            target = weights[k]
+            k += 1
+        weights_today = holdings / value
+        if t == 0 or cash == value:
+            weights_today[:] = np.nan
+        if band < 0:
+            is_rebalanced = is_target_day
+        else:
+            is_rebalanced = (is_target_day or (daily and k > 0)) and _out_of_band(weights_today, target, band)
+
+        if is_rebalanced:
+            target_normalized = _normalize(target)
+            # the first purchase is free of slippage, as in the kernel
+            is_first = np.isnan(weights_today).all()
+            cost = 0.0 if is_first else _sum(np.abs(value * target_normalized - holdings) * rates)
+            new_shares = np.floor((value - cost) * target_normalized / prices[t])
+            for i in range(n_assets):
+                if math.isnan(new_shares[i]):
+                    new_shares[i] = 0.0
+            if not is_first:
+                cost = _sum(np.abs(new_shares - shares) * prices[t] * rates)
+            shares = new_shares
+            holdings = shares * prices[t]
+            cash = value - _sum(holdings) - cost
+            value = value - cost
+
+        asset_weights_daily[t] = holdings / value
+        total_return[t] = value / capital
+        is_trading_day[t] = is_rebalanced
+        cash_weight[t] = cash / value
+    return asset_weights_daily, total_return, is_trading_day, cash_weight
@@ -1,12 +1,12 @@
 import abc
-from datetime import datetime
-
 import numpy as np
 import pandas as pd
 
+from core import fx, kernel, profiling, simulator, trading_calendar
+from core.cache import get_result_cache, result_key
 from core.datareader import ReadData
 from core.score import *
-from core.ticker import Ticker, KRW, BIL
+from core.ticker import Ticker, BIL
 
 
 class Strategy(abc.ABC):
@@ -14,6 +14,11 @@ class Strategy(abc.ABC):
     Abstract Strategy.
     """
 
+    # number of previous trading days the asset weights of a trading day depend on
+    lookback = 0
+    # number of dates before each trading day calculate_asset_weights() reads, None if it reads any date
+    scoring_rows = None
+
     def __init__(self, name, tickers):
         self.name = name
         self.tickers = sorted(tickers)
@@ -22,85 +27,97 @@ class Strategy(abc.ABC):
         return self.name
 
     def analyze(self, trading_day="end", trading_price="Close", start=None, end=None, in_krw=True, slippage=0.003,
+                base_currency=None, band=None, band_daily=False, capital=None, use_cache=False,
                 **kwargs) -> pd.DataFrame:
         """
         Get daily profit of the strategy.
-        :param trading_day: Rebalancing day. Possible values are: 1 ~ 31 or 'end', 'ending', 'begin', 'beginning'.
+        :param trading_day: Rebalancing day. See get_trading_days().
         :param trading_price: Price used when rebalancing assets.
         :param start: Start date of analyzing period.
         :param end: End date of analyzing period.
         :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param slippage: Slippage on the traded portion of the portfolio. A rate for all assets, or rates by Ticker or
+            by currency such as {'KRW': 0.001, 'USD': 0.003}.
+        :param base_currency: Currency to convert assets into, such as 'KRW' or 'USD'. Overrides in_krw.
+        :param band: If given, rebalance only when the weight of any asset drifts from its target by more than it.
+        :param band_daily: If true, check the band every day. Otherwise, check it at trading days only.
+        :param capital: If given, hold whole shares bought with the capital. The rest is kept as cash.
+        :param use_cache: If true, load and save the profit in the default core.cache.ResultCache. Computing its key
+            hashes the data, so it pays off only for repeated runs such as script/experiment.py.
         :param kwargs:
         :return: Daily profit of the strategy.
         """
-        data, asset_weights = self.asset_weights_from_tickers(self.tickers,
-                                                              trading_day, trading_price, start, end, in_krw,
-                                                              **kwargs)
-        profit = self.calculate_profit(data, asset_weights, in_krw, **kwargs)
+        with profiling.stage("read_data", self) as record:
+            data = self.read_data(self.tickers, trading_price, start, end, in_krw, base_currency=base_currency,
+                                  **kwargs)
+            record["rows"] = len(data)
+
+        # profit of the same definition, parameters and data
+        result_cache = get_result_cache() if use_cache else None
+        if result_cache is not None:
+            key = result_key(self, data, trading_day=trading_day, trading_price=trading_price, start=start, end=end,
+                             in_krw=in_krw, slippage=slippage, base_currency=base_currency, band=band,
+                             band_daily=band_daily, capital=capital,
+                             **{k: v for k, v in kwargs.items() if k != "universe"})
+            profit = result_cache.load(key)
+            if profit is not None:
+                return profit
+
+        asset_weights = self.asset_weights_from_data(data, trading_day, **kwargs)
+        with profiling.stage("calculate_profit", self) as record:
+            profit = self.calculate_profit(data, asset_weights, in_krw, base_currency=base_currency,
+                                           trading_price=trading_price, slippage=slippage, band=band,
+                                           band_daily=band_daily, capital=capital, **kwargs)
+            record["rows"] = len(profit)
+        if result_cache is not None:
+            result_cache.save(key, profit)
         return profit
 
     def asset_weights_from_tickers(self, tickers: list[Ticker],
                                    trading_day="end", trading_price="Close", start=None, end=None, in_krw=True,
                                    **kwargs):
-        data = self.read_data(tickers, trading_price, start, end, in_krw, **kwargs)
-        trading_days = self.get_trading_days(data, trading_day, **kwargs)
-        asset_weights = self.calculate_asset_weights(data, trading_days, **kwargs)
-        return data, asset_weights
+        with profiling.stage("read_data", self) as record:
+            data = self.read_data(tickers, trading_price, start, end, in_krw, **kwargs)
+            record["rows"] = len(data)
+        return data, self.asset_weights_from_data(data, trading_day, **kwargs)
+
+    def asset_weights_from_data(self, data: pd.DataFrame, trading_day="end", **kwargs) -> pd.DataFrame:
+        with profiling.stage("get_trading_days", self) as record:
+            trading_days = self.get_trading_days(data, trading_day, **kwargs)
+            record["rows"] = len(trading_days)
+        with profiling.stage("calculate_asset_weights", self) as record:
+            asset_weights = self.calculate_asset_weights(data, trading_days, **kwargs)
+            record["rows"] = len(asset_weights)
+        return asset_weights
 
     @staticmethod
-    def read_data(tickers: list[Ticker], trading_price="Close", start=None, end=None, in_krw=True,
-                  **kwargs) -> pd.DataFrame:
-        # read data
-        tickers = tickers.copy()
-        if in_krw:
-            tickers.append(KRW)
+    def read_data(tickers: list[Ticker], trading_price="Close", start=None, end=None, in_krw=True, universe=None,
+                  base_currency=None, **kwargs) -> pd.DataFrame:
+        # data of the universe already read for the period
+        if universe is not None:
+            return universe.read_data(tickers, trading_price, in_krw, base_currency)
+
+        # read data with exchange rates to the base currency
+        tickers = tickers + fx.fx_tickers(tickers, fx.get_base_currency(in_krw, base_currency))
         data = ReadData(tickers, start=start, end=end, **kwargs)
         data = data[trading_price]
         return data
 
     @staticmethod
-    def get_trading_days(data: pd.DataFrame, trading_day, **kwargs) -> pd.Series:
+    def get_trading_days(data: pd.DataFrame, trading_day, **kwargs) -> pd.DatetimeIndex:
         """
         Get trading days.
         :param data: Daily assets data.
-        :param trading_day: Rebalancing day. Possible values are: 1 ~ 31 or 'end', 'ending', 'begin', 'beginning'.
+        :param trading_day: Rebalancing day. Possible values are: 1 ~ 31, 'end', 'ending', 'begin', 'beginning',
+            'weekly', 'week_end', 'week_begin', 'quarterly', 'quarter_end', 'quarter_begin' or 'nth:N'.
+            See core.trading_calendar.get_trading_days().
         :param kwargs:
         :return: Trading days.
         """
-        is_trading_day = pd.DataFrame()
-        is_trading_day["year"] = data.index.year
-        is_trading_day["month"] = data.index.month
-        is_trading_day["day"] = data.index.day
-
-        if isinstance(trading_day, int):
-            is_trading_day["day_err"] = is_trading_day["day"] - trading_day + 31 * (is_trading_day["day"] < trading_day)
-
-            group = []
-            g = 0
-            for i, row in enumerate(is_trading_day.itertuples()):
-                if i == 0:
-                    group.append(g)
-                elif is_trading_day.iloc[i-1]["day_err"] > is_trading_day.iloc[i]["day_err"]:
-                    g += 1
-                    group.append(g)
-                else:
-                    group.append(g)
-
-            is_trading_day["group"] = group
-            is_trading_day = is_trading_day.groupby(["group"]).apply(lambda x: x.iloc[x["day_err"].argmin()])
-        elif isinstance(trading_day, str):
-            if trading_day.lower() in ["end", "ending"]:
-                is_trading_day = is_trading_day.groupby(["year", "month"]).apply(lambda x: x.iloc[x["day"].argmax()])
-            elif trading_day.lower() in ["begin", "beginning"]:
-                is_trading_day = is_trading_day.groupby(["year", "month"]).apply(lambda x: x.iloc[x["day"].argmin()])
-        else:
-            raise NotImplementedError(f"trading_day[{trading_day}] is not implemented")
-
-        trading_days = is_trading_day.apply(lambda x: datetime(x["year"], x["month"], x["day"]), axis=1)
-        return trading_days
+        return trading_calendar.get_trading_days(data.index, trading_day)
 
     @abc.abstractmethod
-    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.Series, **kwargs) -> pd.DataFrame:
+    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.DatetimeIndex, **kwargs) -> pd.DataFrame:
         """
         Calculate asset weights under the strategy.
         :param data: Daily assets data.
@@ -111,48 +128,104 @@ class Strategy(abc.ABC):
         ...
 
     @staticmethod
-    def calculate_profit(data: pd.DataFrame, asset_weights: pd.DataFrame, in_krw=True,
-                         **kwargs) -> pd.DataFrame:
+    def calculate_profit(data: pd.DataFrame, asset_weights: pd.DataFrame, in_krw=True, base_currency=None,
+                         trading_price="Close", universe=None, slippage=0.003, band=None, band_daily=False,
+                         capital=None, **kwargs) -> pd.DataFrame:
         """
         Get daily profit.
+        Calendar rebalancing with a single slippage rate is simulated by core.kernel, and the other rules are simulated
+        day by day by core.simulator.
         :param data: Daily assets data.
         :param asset_weights: Weights of assets trying to buy at each trading day.
         :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :param trading_price: Price used when rebalancing assets.
+        :param universe: Universe the data is read from. Its converted prices are reused if given.
+        :param slippage: Slippage on the traded portion of the portfolio, a rate or rates by Ticker or currency.
+        :param band: If given, rebalance only when the weight of any asset drifts from its target by more than it.
+        :param band_daily: If true, check the band every day. Otherwise, check it at trading days only.
+        :param capital: If given, hold whole shares bought with the capital. The rest is kept as cash.
         :param kwargs:
-        :return: Daily profit.
+        :return: Daily profit. With capital, cash is in the "cash" column.
         """
-        tickers_trading = asset_weights.columns
-        trading_day = asset_weights.index
-        start = trading_day[0]
-        data_trading = data.loc[start:, tickers_trading]
-        if in_krw:
-            data_trading = data_trading.apply(lambda x: x * data[KRW] if x.name.currency == "USD" else x).dropna()
-        is_trading_day = data_trading.apply(lambda x: x.name in trading_day, axis=1)
-        full_day = data_trading.index
-        asset_weights_at_trading_day = pd.DataFrame(data=asset_weights, index=full_day).fillna(method='ffill')
-
-        change = data_trading.pct_change().fillna(0)
-        change_cum = (1 + change).cumprod()
-        change_cum_at_trading_day = pd.DataFrame(data=change_cum.loc[trading_day], index=full_day)\
-            .fillna(method='ffill').fillna(1)
-        change_cum_from_trading_day = change_cum / change_cum_at_trading_day
-
-        asset_weights_daily = (asset_weights_at_trading_day * change_cum_from_trading_day)\
-            .apply(lambda x: x/x.sum(), axis=1)     # normalize
-        asset_returned_daily = (asset_weights_daily.shift(1) * (1 + change)) \
-            .apply(lambda x: x/x.sum(), axis=1)     # normalize
-        asset_changed_daily = (asset_weights_daily - asset_returned_daily)\
-            .apply(lambda x: x * is_trading_day)\
-            .apply(np.abs)
-
-        slippage = 0.003
-        slippage_daily = asset_changed_daily.sum(axis=1) * slippage
-        total_return = (1 + (asset_weights_daily.shift(1) * change).sum(axis=1) - slippage_daily).cumprod()
-        profit = asset_weights_daily.apply(lambda x: x * total_return)
+        full_day, prices, change, rebalance, weights = Strategy.simulation_inputs(data, asset_weights, in_krw,
+                                                                                  base_currency, trading_price,
+                                                                                  universe)
+        if band is None and capital is None and not isinstance(slippage, dict):
+            asset_weights_daily, total_return, is_trading_day, _ = kernel.simulate(change, rebalance, weights,
+                                                                                   slippage)
+            cash = None
+        else:
+            rates = simulator.slippage_rates(slippage, list(asset_weights.columns))
+            asset_weights_daily, total_return, is_trading_day, cash = simulator.simulate(
+                change, rebalance, weights, rates, band, band_daily, prices, capital)
+
+        profit = pd.DataFrame(data=asset_weights_daily * total_return[:, np.newaxis],
+                              index=full_day, columns=asset_weights.columns)
+        if capital is not None:
+            profit["cash"] = cash * total_return
         profit["total_return"] = total_return
         profit["is_trading_day"] = is_trading_day
         return profit
 
+    @staticmethod
+    def simulation_inputs(data: pd.DataFrame, asset_weights: pd.DataFrame, in_krw=True, base_currency=None,
+                          trading_price="Close", universe=None):
+        """
+        Get inputs of core.kernel.simulate() for asset weights.
+        :param data: Daily assets data.
+        :param asset_weights: Weights of assets trying to buy at each trading day.
+        :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :param trading_price: Price used when rebalancing assets.
+        :param universe: Universe the data is read from. Its converted prices are reused if given.
+        :return: Tuple of days (T,), daily prices of assets (T, N), daily returns of assets (T, N),
+            positions of trading days (K,) and target weights at trading days (K, N).
+        """
+        tickers_trading = asset_weights.columns
+        trading_day = asset_weights.index
+        base_currency = fx.get_base_currency(in_krw, base_currency)
+        panel = None
+        if universe is not None and base_currency is not None:
+            panel = universe.prices(trading_price, base_currency)
+        full_day, prices = Strategy.trading_prices(data, tickers_trading, trading_day[0], in_krw,
+                                                   base_currency=base_currency, panel=panel)
+
+        change = np.zeros_like(prices)
+        change[1:] = prices[1:] / prices[:-1] - 1
+        rebalance = full_day.get_indexer(trading_day)
+        is_rebalance = rebalance >= 0
+        weights = asset_weights.ffill().to_numpy(dtype=np.float64)
+        return full_day, prices, change, rebalance[is_rebalance], weights[is_rebalance]
+
+    @staticmethod
+    def trading_prices(data: pd.DataFrame, tickers_trading: list[Ticker], start=None, in_krw=True,
+                       base_currency=None, panel: pd.DataFrame = None):
+        """
+        Get prices of trading assets.
+        :param data: Daily assets data.
+        :param tickers_trading: Trading assets.
+        :param start: First day.
+        :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :param panel: Daily prices already converted into base currency, such as Universe.prices().
+        :return: Tuple of days and prices.
+        """
+        base_currency = fx.get_base_currency(in_krw, base_currency)
+        data_trading = data.loc[start:, tickers_trading]
+        if base_currency is None:
+            return data_trading.index, data_trading.to_numpy(dtype=np.float64)
+
+        if panel is None:
+            tickers_trading = list(tickers_trading)
+            panel = fx.convert(data.loc[start:, tickers_trading + fx.fx_tickers(tickers_trading, base_currency)],
+                               base_currency)
+        prices = panel.loc[data_trading.index, tickers_trading].to_numpy(dtype=np.float64)
+        is_valid = ~np.isnan(prices).any(axis=1)
+        if not is_valid.all():
+            data_trading, prices = data_trading[is_valid], prices[is_valid]
+        return data_trading.index, prices
+
 
 class SAA(Strategy):
     """
@@ -169,7 +242,10 @@ class SAA(Strategy):
         super().__init__(name, tickers)
         self.weights = {t: w for t, w in zip(tickers, weights)}
 
-    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.Series, **kwargs) -> pd.DataFrame:
+    # weights are the same at every trading day
+    scoring_rows = 0
+
+    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.DatetimeIndex, **kwargs) -> pd.DataFrame:
         asset_weights = pd.DataFrame(index=trading_days, columns=self.tickers, data=[self.weights] * len(trading_days))
         return asset_weights
 
@@ -179,6 +255,11 @@ class BAA(Strategy):
     Bold Asset Allocation.
     """
 
+    # 12 months of momentum and SMA(13)
+    lookback = 12
+    # scores are calculated from the day before each trading day
+    scoring_rows = 1
+
     def __init__(self,
                  name: str,
                  tickers_canary: list[Ticker],
@@ -198,9 +279,9 @@ class BAA(Strategy):
         self.n_risk = n_risk
         self.n_safe = n_safe
 
-    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.Series, **kwargs) -> pd.DataFrame:
+    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.DatetimeIndex, **kwargs) -> pd.DataFrame:
         # data for scoring - data of the day before trading days
-        data_scoring = data.apply(floor, decimal=4).shift(periods=1).loc[trading_days]
+        data_scoring = self._data_scoring(data, trading_days)
         # data for scoring canary assets
         data_scoring_canary = data_scoring[self.tickers_canary]
         # data for scoring risk and safe assets
@@ -214,33 +295,53 @@ class BAA(Strategy):
         asset_weights = self._get_asset_weights(momentum_score, canary_score)
         return asset_weights
 
+    @staticmethod
+    def _data_scoring(data: pd.DataFrame, trading_days: pd.DatetimeIndex) -> pd.DataFrame:
+        # floored data of the day before each trading day
+        positions = data.index.get_indexer(trading_days)
+        if (positions < 0).any():
+            raise KeyError(f"{list(trading_days[positions < 0])} not in data")
+        values = np.full((len(positions), data.shape[1]), np.nan)
+        values[positions > 0] = floor(data.to_numpy(dtype=np.float64)[positions[positions > 0] - 1], decimal=4)
+        return pd.DataFrame(data=values, index=data.index[positions], columns=data.columns)
+
     def _get_asset_weights(self, momentum_score: pd.DataFrame, canary_score: pd.DataFrame) -> pd.DataFrame:
-        run_to_safety = (canary_score < 0).any(axis=1)
+        score_risk, score_safe, asset_safe_top_n, asset_risk_weight, asset_safe_weight = \
+            self._get_top_n_weights(momentum_score, canary_score)
+
+        self._reallocate_worse_than_bil(score_safe, asset_safe_weight)
+        return self._combine_weights(momentum_score, asset_risk_weight, asset_safe_weight)
 
-        asset_risk_score_threshold = momentum_score[self.tickers_risk] \
-            .apply(lambda x: x.sort_values(ascending=False)[self.n_risk - 1], axis=1)
-        asset_safe_score_threshold = momentum_score[self.tickers_safe] \
-            .apply(lambda x: x.sort_values(ascending=False)[self.n_safe - 1], axis=1)
+    def _get_top_n_weights(self, momentum_score: pd.DataFrame, canary_score: pd.DataFrame):
+        run_to_safety = (canary_score < 0).any(axis=1) \
+            .reindex(momentum_score.index, fill_value=False).to_numpy(dtype=bool)[:, np.newaxis]
+        score_risk = momentum_score[self.tickers_risk].to_numpy(dtype=np.float64)
+        score_safe = momentum_score[self.tickers_safe].to_numpy(dtype=np.float64)
 
-        asset_risk_top_n = momentum_score[self.tickers_risk] \
-            .apply(lambda x: x >= asset_risk_score_threshold).applymap(int)
-        asset_safe_top_n = momentum_score[self.tickers_safe] \
-            .apply(lambda x: x >= asset_safe_score_threshold).applymap(int)
+        asset_risk_top_n = top_n(score_risk, self.n_risk)
+        asset_safe_top_n = top_n(score_safe, self.n_safe)
 
         # calculate weights
-        asset_risk_weight = asset_risk_top_n.apply(lambda x: x * (1 - run_to_safety) / self.n_risk)
-        asset_safe_weight = asset_safe_top_n.apply(lambda x: x * run_to_safety / self.n_safe)
+        asset_risk_weight = asset_risk_top_n * ~run_to_safety / self.n_risk
+        asset_safe_weight = asset_safe_top_n * run_to_safety / self.n_safe
+        return score_risk, score_safe, asset_safe_top_n, asset_risk_weight, asset_safe_weight
 
+    def _reallocate_worse_than_bil(self, score_safe: np.ndarray, asset_safe_weight: np.ndarray):
         # if a safe asset was worse than BIL, allocate that portion of the asset to BIL.
-        asset_safe_worse_than_bil = momentum_score[self.tickers_safe].apply(lambda x: x < x[self.ticker_bil], axis=1).applymap(int)
+        i_bil = self.tickers_safe.index(self.ticker_bil)
+        asset_safe_worse_than_bil = score_safe < score_safe[:, [i_bil]]
         asset_safe_weight_worse_than_bil = asset_safe_weight * asset_safe_worse_than_bil
         asset_safe_weight -= asset_safe_weight_worse_than_bil
-        asset_safe_weight[self.ticker_bil] += asset_safe_weight_worse_than_bil.sum(axis=1)
+        asset_safe_weight[:, i_bil] += asset_safe_weight_worse_than_bil.sum(axis=1)
 
-        asset_weights = pd.DataFrame(data=0, index=momentum_score.index, columns=self.tickers_trading)
-        asset_weights[self.tickers_risk] += asset_risk_weight
-        asset_weights[self.tickers_safe] += asset_safe_weight
-        return asset_weights
+    def _combine_weights(self, momentum_score: pd.DataFrame,
+                         asset_risk_weight: np.ndarray, asset_safe_weight: np.ndarray) -> pd.DataFrame:
+        i_risk = [self.tickers_trading.index(t) for t in self.tickers_risk]
+        i_safe = [self.tickers_trading.index(t) for t in self.tickers_safe]
+        asset_weights = np.zeros((len(momentum_score), len(self.tickers_trading)))
+        asset_weights[:, i_risk] += asset_risk_weight
+        asset_weights[:, i_safe] += asset_safe_weight
+        return pd.DataFrame(data=asset_weights, index=momentum_score.index, columns=self.tickers_trading)
 
 
 class HAA(BAA):
@@ -265,9 +366,9 @@ class HAA(BAA):
                          n_risk,
                          n_safe)
 
-    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.Series, **kwargs) -> pd.DataFrame:
+    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.DatetimeIndex, **kwargs) -> pd.DataFrame:
         # data for scoring - data of the day before trading days
-        data_scoring = data.apply(floor, decimal=4).shift(periods=1).loc[trading_days]
+        data_scoring = self._data_scoring(data, trading_days)
         # data for scoring canary assets
         data_scoring_canary = data_scoring[self.tickers_canary]
         # data for scoring risk and safe assets
@@ -282,41 +383,20 @@ class HAA(BAA):
         return asset_weights
 
     def _get_asset_weights(self, momentum_score: pd.DataFrame, canary_score: pd.DataFrame) -> pd.DataFrame:
-        run_to_safety = (canary_score < 0).any(axis=1)
-
-        asset_risk_score_threshold = momentum_score[self.tickers_risk] \
-            .apply(lambda x: x.sort_values(ascending=False)[self.n_risk - 1], axis=1)
-        asset_safe_score_threshold = momentum_score[self.tickers_safe] \
-            .apply(lambda x: x.sort_values(ascending=False)[self.n_safe - 1], axis=1)
-
-        asset_risk_top_n = momentum_score[self.tickers_risk] \
-            .apply(lambda x: x >= asset_risk_score_threshold).applymap(int)
-        asset_safe_top_n = momentum_score[self.tickers_safe] \
-            .apply(lambda x: x >= asset_safe_score_threshold).applymap(int)
-
-        # calculate weights
-        asset_risk_weight = asset_risk_top_n.apply(lambda x: x * (1 - run_to_safety) / self.n_risk)
-        asset_safe_weight = asset_safe_top_n.apply(lambda x: x * run_to_safety / self.n_safe)
+        score_risk, score_safe, asset_safe_top_n, asset_risk_weight, asset_safe_weight = \
+            self._get_top_n_weights(momentum_score, canary_score)
 
         # if a risk asset has a negative momentum, allocate that portion of the asset to safe assets.
-        asset_risk_neg_mtm = momentum_score[self.tickers_risk].apply(lambda x: x < 0, axis=1).applymap(int)
+        asset_risk_neg_mtm = score_risk < 0
         asset_risk_weight_neg_mtm = asset_risk_weight * asset_risk_neg_mtm
         asset_risk_weight -= asset_risk_weight_neg_mtm
 
         asset_risk_weight_neg_mtm_reallocated = asset_safe_top_n \
-            .apply(lambda x: x * np.asarray(asset_risk_weight_neg_mtm.sum(axis=1))) / self.n_safe
+            * asset_risk_weight_neg_mtm.sum(axis=1)[:, np.newaxis] / self.n_safe
         asset_safe_weight += asset_risk_weight_neg_mtm_reallocated
 
-        # if a safe asset was worse than BIL, allocate that portion of the asset to BIL.
-        asset_safe_worse_than_bil = momentum_score[self.tickers_safe].apply(lambda x: x < x[self.ticker_bil], axis=1).applymap(int)
-        asset_safe_weight_worse_than_bil = asset_safe_weight * asset_safe_worse_than_bil
-        asset_safe_weight -= asset_safe_weight_worse_than_bil
-        asset_safe_weight[self.ticker_bil] += asset_safe_weight_worse_than_bil.sum(axis=1)
-
-        asset_weights = pd.DataFrame(data=0, index=momentum_score.index, columns=self.tickers_trading)
-        asset_weights[self.tickers_risk] += asset_risk_weight
-        asset_weights[self.tickers_safe] += asset_safe_weight
-        return asset_weights
+        self._reallocate_worse_than_bil(score_safe, asset_safe_weight)
+        return self._combine_weights(momentum_score, asset_risk_weight, asset_safe_weight)
 
 
 class Alternatives(Strategy):
@@ -332,23 +412,171 @@ class Alternatives(Strategy):
         self.strategy = strategy
         self.alternatives = alternatives
 
+    @property
+    def lookback(self):
+        return self.strategy.lookback
+
+    @property
+    def scoring_rows(self):
+        return self.strategy.scoring_rows
+
     def analyze(self, trading_day="end", trading_price="Close", start=None, end=None, in_krw=True,
                 **kwargs) -> pd.DataFrame:
+        if isinstance(kwargs.get("slippage"), dict):
+            kwargs["slippage"] = self.traded_slippage(kwargs["slippage"])
         profit = self.strategy.analyze(trading_day, trading_price, start, end, in_krw, **kwargs)
         # switch trading assets to alternatives
         profit.rename(columns=self.alternatives, inplace=True)
         return profit
 
-    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.Series, **kwargs) -> pd.DataFrame:
+    def traded_slippage(self, slippage: dict) -> dict:
+        """
+        Get slippage of assets of the base strategy from slippage of the alternatives actually traded.
+        :param slippage: Rates by Ticker or by currency. A rate of a ticker takes precedence over a rate of its
+            currency.
+        :return: Rates by Ticker of the base strategy. Tickers without a rate are omitted.
+        """
+        rates = {}
+        for t in self.tickers:
+            traded = self.alternatives.get(t, t)
+            if traded in slippage:
+                rates[t] = slippage[traded]
+            elif traded.currency in slippage:
+                rates[t] = slippage[traded.currency]
+        return rates
+
+    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.DatetimeIndex, **kwargs) -> pd.DataFrame:
         # calculate asset weights by base strategy
         return self.strategy.calculate_asset_weights(data, trading_days, **kwargs)
 
 
+class Composite(Strategy):
+    """
+    Mix of strategies as sleeves, rebalanced between sleeves at its own trading days.
+    Each sleeve is held like an asset priced by the total return of its strategy, so a composite is simulated from
+    profits of its components, and components already analyzed are shared by all composites using them.
+    """
+
+    def __init__(self,
+                 name: str,
+                 strategies: list[Strategy],
+                 weights: list[float],
+                 trading_day=None,
+                 slippage=None):
+        """
+        :param name: Name.
+        :param strategies: Component strategies.
+        :param weights: Weights of components.
+        :param trading_day: Rebalancing day between sleeves. If None, the rebalancing day of components.
+        :param slippage: Slippage on the portion traded between sleeves. If None, the slippage of components, which
+            must then be a single rate.
+        """
+        assert len(strategies) == len(weights), "number of strategies and weights must be same"
+        super().__init__(name, list(set(t for st in strategies for t in st.tickers)))
+        self.strategies = strategies
+        self.weights = np.array(weights, dtype=np.float64) / np.sum(weights)
+        self.trading_day = trading_day
+        self.slippage = slippage
+
+    @property
+    def lookback(self):
+        return max(st.lookback for st in self.strategies)
+
+    def analyze(self, trading_day="end", trading_price="Close", start=None, end=None, in_krw=True, slippage=0.003,
+                results: dict = None, **kwargs) -> pd.DataFrame:
+        """
+        Get daily profit of the composite.
+        :param results: Daily profit of strategies already analyzed with the same parameters, such as the result of
+            analyze_strategies(). Components are looked up in it, and the ones analyzed here are added to it.
+        See Strategy.analyze() for the other parameters.
+        """
+        sleeve_slippage = slippage if self.slippage is None else self.slippage
+        if isinstance(sleeve_slippage, dict):
+            raise ValueError(f"Composite[{self}] needs a single slippage rate between sleeves, "
+                             f"set Composite(slippage=...) to analyze with slippage by ticker or currency")
+
+        results = {} if results is None else results
+        profits = []
+        for st in self.strategies:
+            if st not in results:
+                component_kwargs = {"results": results} if isinstance(st, Composite) else {}
+                results[st] = st.analyze(trading_day, trading_price, start, end, in_krw, slippage=slippage,
+                                         **component_kwargs, **kwargs)
+            profits.append(results[st])
+        return self.combine(profits, self.trading_day or trading_day, sleeve_slippage)
+
+    def combine(self, profits: list[pd.DataFrame], trading_day="end", slippage=0.003) -> pd.DataFrame:
+        """
+        Get daily profit of the composite from daily profits of components.
+        :param profits: Daily profit of each component.
+        :param trading_day: Rebalancing day between sleeves.
+        :param slippage: Slippage on the portion traded between sleeves.
+        :return: Daily profit on the dates all components have.
+        """
+        full_day = profits[0].index
+        for profit in profits[1:]:
+            full_day = full_day.intersection(profit.index)
+
+        # each sleeve grows by the total return of its component
+        sleeve_return = np.column_stack([p["total_return"].reindex(full_day).to_numpy(dtype=np.float64)
+                                         for p in profits])
+        change = np.zeros_like(sleeve_return)
+        change[1:] = sleeve_return[1:] / sleeve_return[:-1] - 1
+        # sleeves are bought at the first day
+        rebalance = trading_calendar.get_trading_positions(np.asarray(full_day.values, dtype="datetime64[ns]"),
+                                                           trading_day)
+        rebalance = np.union1d([0], rebalance)
+        weights = np.tile(self.weights, (len(rebalance), 1))
+        sleeve_weights, total_return, is_trading_day, _ = kernel.simulate(change, rebalance, weights, slippage)
+
+        # assets of each sleeve in proportion to the sleeve
+        assets = {}
+        for i, profit in enumerate(profits):
+            profit = profit.reindex(full_day)
+            component_weights = profit.drop(columns=["total_return", "is_trading_day"]) \
+                .div(profit["total_return"], axis=0)
+            for ticker, w in component_weights.items():
+                w = w.to_numpy(dtype=np.float64) * sleeve_weights[:, i]
+                assets[ticker] = assets[ticker] + w if ticker in assets else w
+
+        profit = pd.DataFrame(data=assets, index=full_day)
+        profit = profit.mul(total_return, axis=0)
+        profit["total_return"] = total_return
+        is_component_trading_day = [p["is_trading_day"].reindex(full_day).to_numpy(dtype=bool) for p in profits]
+        profit["is_trading_day"] = np.logical_or.reduce([is_trading_day] + is_component_trading_day)
+        return profit
+
+    def calculate_asset_weights(self, data: pd.DataFrame, trading_days: pd.DatetimeIndex, **kwargs) -> pd.DataFrame:
+        # target weights of components in proportion to the sleeves, on trading days all components have
+        asset_weights = [w * st.calculate_asset_weights(data, trading_days, **kwargs)
+                         for st, w in zip(self.strategies, self.weights)]
+        index = asset_weights[0].index
+        for aw in asset_weights[1:]:
+            index = index.intersection(aw.index)
+        combined = pd.concat([aw.loc[index] for aw in asset_weights], axis=1)
+        return combined.T.groupby(level=0, sort=False).sum().T
+
+
 def floor(x, decimal=4):
     pos = 10**decimal
     return np.floor(x * pos) / pos
 
 
+def top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    """
+    Select top n assets of each row.
+    Ties at the n-th score are broken by column order, so exactly n assets are selected.
+    :param scores: Scores of assets. (dates, assets)
+    :param n: Number of assets to select.
+    :return: Whether selected. (dates, assets)
+    """
+    n = min(n, scores.shape[1])
+    threshold = -np.partition(-scores, n - 1, axis=1)[:, [n - 1]]
+    above = scores > threshold
+    tied = scores == threshold
+    return above | (tied & (np.cumsum(tied, axis=1) <= n - above.sum(axis=1, keepdims=True)))
+
+
 if __name__ == '__main__':
     from core.ticker import *
 
@@ -0,0 +1,278 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from core import fx, kernel, profiling, trading_calendar
+from core.datareader import ReadData
+from core.strategy import Strategy, Alternatives, Composite
+
+
+# length of dates read at once. The kernel keeps about 12 arrays of (days, assets) per chunk.
+DEFAULT_PERIOD = pd.DateOffset(years=1)
+
+
+class StreamingBacktest:
+    """
+    Backtest of asset weights over prices given in chunks of consecutive days.
+    Portfolio state of core.kernel is carried across chunks, so memory depends on the chunk size rather than the length
+    of history, and profit matches Strategy.calculate_profit() on the whole prices up to rounding.
+    Weights of trading days can be added along with the chunks, and weights already simulated are discarded.
+    Profit of each chunk is appended to a csv file if a path is given, and only summary metrics are kept in memory.
+    """
+
+    def __init__(self, asset_weights: pd.DataFrame = None, slippage=0.003, path=None, columns: dict = None):
+        """
+        :param asset_weights: Weights of assets trying to buy at each trading day. More can be added by add_weights().
+        :param slippage: Slippage on the traded portion of the portfolio.
+        :param path: Csv file to write daily profit into. Overwritten by the first chunk.
+        :param columns: Names of assets in the profit, such as alternatives of Alternatives.
+        """
+        self.tickers = None
+        self.columns = columns or {}
+        self.trading_day = pd.DatetimeIndex([])
+        self.weights = None
+        self.slippage = slippage
+        self.path = path
+
+        self.state = None
+        self.last_day = None
+        self.last_prices = None
+        self.n_days = 0
+        self.total_return = 1.0
+        self.peak = 1.0
+        self.max_drawdown = 0.0
+
+        if asset_weights is not None:
+            self.add_weights(asset_weights)
+
+    def add_weights(self, asset_weights: pd.DataFrame):
+        """
+        Add weights of trading days after the known ones. Missing weights are filled with the previous ones.
+        :param asset_weights: Weights of assets trying to buy at each trading day.
+        """
+        if len(asset_weights) == 0:
+            return
+        if self.tickers is None:
+            self.tickers = asset_weights.columns
+        else:
+            asset_weights = pd.concat([pd.DataFrame(data=self.weights, index=self.trading_day, columns=self.tickers),
+                                       asset_weights[self.tickers]])
+        self.trading_day = asset_weights.index
+        self.weights = asset_weights.ffill().to_numpy(dtype=np.float64)
+
+    def update(self, prices: pd.DataFrame) -> pd.DataFrame:
+        """
+        Simulate the next chunk of days.
+        Days before the first trading day or already simulated are skipped.
+        :param prices: Daily prices of trading assets, in base currency.
+        :return: Daily profit of the chunk, or None if no weights are known yet.
+        """
+        if self.tickers is None:
+            return None
+        start = self.trading_day[0] if self.last_day is None else self.last_day + pd.Timedelta(1, "ns")
+        prices = prices.loc[start:, self.tickers]
+        values = prices.to_numpy(dtype=np.float64)
+        if len(values) == 0:
+            return self._profit(prices.index, np.empty((0, len(self.tickers))), np.empty(0), np.empty(0, dtype=bool))
+
+        # returns of the first day continue from the last prices of the previous chunk
+        change = np.zeros_like(values)
+        change[1:] = values[1:] / values[:-1] - 1
+        if self.last_prices is not None:
+            change[0] = values[0] / self.last_prices - 1
+
+        position = self.trading_day.get_indexer(prices.index)
+        rebalance = np.flatnonzero(position >= 0)
+        asset_weights_daily, total_return, is_trading_day, self.state = kernel.simulate(
+            change, rebalance, self.weights[position[rebalance]], self.slippage, self.state)
+
+        self.last_day = prices.index[-1]
+        self.last_prices = values[-1].copy()
+        self.n_days += len(values)
+        self.total_return = float(total_return[-1])
+        peak = np.maximum.accumulate(np.append(self.peak, total_return))
+        self.peak = float(peak[-1])
+        self.max_drawdown = min(self.max_drawdown, float((total_return / peak[1:] - 1).min()))
+
+        # keep the last simulated weights only, which later missing weights are filled with
+        first = max(self.trading_day.searchsorted(self.last_day, side="right") - 1, 0)
+        self.trading_day, self.weights = self.trading_day[first:], self.weights[first:]
+
+        profit = self._profit(prices.index, asset_weights_daily, total_return, is_trading_day)
+        if self.path is not None:
+            first = self.n_days == len(values)
+            if first:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            profit.to_csv(self.path, mode="w" if first else "a", header=first)
+        return profit
+
+    def run(self, chunks) -> "StreamingBacktest":
+        """
+        Simulate all chunks, discarding their profit after writing it.
+        :param chunks: Iterable of daily prices of trading assets in consecutive days.
+        :return: self
+        """
+        for prices in chunks:
+            with profiling.stage("stream_chunk", rows=len(prices)):
+                self.update(prices)
+        return self
+
+    @property
+    def summary(self) -> dict:
+        return {
+            "days": self.n_days,
+            "end": self.last_day,
+            "total_return": self.total_return,
+            "max_drawdown": self.max_drawdown,
+        }
+
+    def _profit(self, index: pd.DatetimeIndex, asset_weights_daily: np.ndarray, total_return: np.ndarray,
+                is_trading_day: np.ndarray) -> pd.DataFrame:
+        profit = pd.DataFrame(data=asset_weights_daily * total_return[:, np.newaxis], index=index,
+                              columns=[self.columns.get(t, t) for t in self.tickers])
+        profit["total_return"] = total_return
+        profit["is_trading_day"] = is_trading_day
+        return profit
+
+
+def data_chunks(tickers: list, trading_price="Close", start=None, end=None, in_krw=True, base_currency=None,
+                period=DEFAULT_PERIOD, universe=None, **kwargs):
+    """
+    Generate daily data of tickers in windows of dates, read one window at a time.
+    Each window has the same dates and values as Strategy.read_data() over the whole period.
+    :param tickers: Tickers.
+    :param trading_price: Price used when rebalancing assets.
+    :param start: Start date. Required unless a universe is given.
+    :param end: End date. None means up to date.
+    :param in_krw: If true, include KRW for currency conversion.
+    :param base_currency: Currency to convert assets into. Overrides in_krw.
+    :param period: Length of a window, such as pd.DateOffset(years=1).
+    :param universe: Universe already loaded. Windows are taken from its data, and start and end are ignored as in
+        Strategy.read_data().
+    :param kwargs: Parameters of ReadData.
+    :return: Generator of daily data of tickers and exchange rates to the base currency.
+    """
+    tickers = tickers + fx.fx_tickers(tickers, fx.get_base_currency(in_krw, base_currency))
+
+    if universe is not None:
+        assert universe.data is not None, "universe is not loaded"
+        index = universe.data.index
+        columns = [col for col in universe.data.columns if col[1] in set(tickers)]
+        window = index[0] if len(index) > 0 else None
+        while window is not None and window <= index[-1]:
+            i, j = index.searchsorted([window, window + period])
+            window += period
+            # date intersection of the tickers within the window, as Universe.read_data()
+            yield universe.data.iloc[i:j][columns].dropna()[trading_price]
+        return
+
+    if start is None:
+        raise ValueError("start is required to read data in windows without a universe")
+    last = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end)
+    window = pd.Timestamp(start)
+    while True:
+        if window + period > last:
+            # the last window ends as requested, up to date if end is None
+            yield ReadData(tickers, start=window, end=end, **kwargs)[trading_price]
+            return
+        data = ReadData(tickers, start=window, end=window + period, **kwargs)[trading_price]
+        # some data sources include the end date
+        yield data.loc[data.index < window + period]
+        window += period
+
+
+def period_chunks(chunks, trading_day="end"):
+    """
+    Regroup chunks of data at boundaries of the periods trading days are chosen in, such as months for 'end'.
+    Dates of the last period are carried to the next chunk, so that trading days of a chunk don't depend on later
+    dates.
+    :param chunks: Iterable of daily data in consecutive dates.
+    :param trading_day: Rebalancing day. See Strategy.get_trading_days().
+    :return: Generator of tuples of daily data and positions of trading days in it.
+    """
+    carry = None
+    for data in chunks:
+        data = data if carry is None else pd.concat([carry, data])
+        values = np.asarray(data.index.values, dtype="datetime64[ns]")
+        cut = trading_calendar.get_last_period_start(values, trading_day)
+        if cut > 0:
+            yield data.iloc[:cut], trading_calendar.get_trading_positions(values[:cut], trading_day)
+        carry = data.iloc[cut:]
+
+    if carry is not None and len(carry) > 0:
+        values = np.asarray(carry.index.values, dtype="datetime64[ns]")
+        yield carry, trading_calendar.get_trading_positions(values, trading_day)
+
+
+def stream_strategy(strategy: Strategy, trading_day="end", trading_price="Close", start=None, end=None, in_krw=True,
+                    slippage=0.003, base_currency=None, period=DEFAULT_PERIOD, path=None, universe=None,
+                    **kwargs) -> StreamingBacktest:
+    """
+    Backtest a strategy in chunks of dates, the streaming version of Strategy.analyze().
+    Data is read a window at a time. Asset weights of trading days in a chunk are calculated from the dates they
+    read only, the trading days and strategy.scoring_rows dates before each, of the last strategy.lookback trading
+    days. Prices are converted into base currency and simulated chunk by chunk, so memory doesn't grow with history.
+    :param strategy: Strategy. Composites are not supported, as they combine daily profits of their components.
+    :param trading_day: Rebalancing day.
+    :param trading_price: Price used when rebalancing assets.
+    :param start: Start date of analyzing period. Required unless a universe is given.
+    :param end: End date of analyzing period.
+    :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+    :param slippage: Slippage on the traded portion of the portfolio.
+    :param base_currency: Currency to convert assets into. Overrides in_krw.
+    :param period: Length of dates read at once.
+    :param path: Csv file to write daily profit into.
+    :param universe: Universe already loaded, to take windows of its data instead of reading them.
+    :param kwargs: Other parameters of Strategy.analyze, such as parameters of ReadData.
+    :return: StreamingBacktest after the last day.
+    """
+    if isinstance(strategy, Composite):
+        raise ValueError(f"Composite[{strategy}] can't be streamed, as it combines daily profits of its components")
+    if strategy.scoring_rows is None:
+        raise ValueError(f"Strategy[{strategy}] can't be streamed, as its asset weights may read any date")
+    base_currency = fx.get_base_currency(in_krw, base_currency)
+    lookback, scoring_rows = strategy.lookback, strategy.scoring_rows
+
+    # alternatives are traded at prices of the assets they replace, as in Alternatives.analyze()
+    columns = strategy.alternatives if isinstance(strategy, Alternatives) else None
+    backtest = StreamingBacktest(slippage=slippage, path=path, columns=columns)
+
+    # dates asset weights read, of the last lookback trading days, and the last dates before the next chunk
+    rows, trading_days, tail = None, pd.DatetimeIndex([]), None
+    chunks = data_chunks(strategy.tickers, trading_price, start, end, in_krw, base_currency, period, universe,
+                         **kwargs)
+    for data, positions in period_chunks(chunks, trading_day):
+        with profiling.stage("stream_chunk", strategy, rows=len(data)):
+            # the first trading days of the chunk read the last dates of the previous one
+            extended = data if tail is None else pd.concat([tail, data])
+            if len(positions) > 0:
+                needed = positions[:, np.newaxis] + len(extended) - len(data) - np.arange(scoring_rows, -1, -1)
+                needed = np.unique(needed[needed >= 0])
+                rows = extended.iloc[needed] if rows is None else pd.concat([rows, extended.iloc[needed]])
+                rows = rows[~rows.index.duplicated()]
+
+                new_days = data.index[positions]
+                trading_days = trading_days.append(new_days)
+                asset_weights = strategy.calculate_asset_weights(
+                    rows, trading_days[-(len(new_days) + lookback):], **kwargs)
+                # weights of trading days without enough history are dropped, as scores are
+                backtest.add_weights(asset_weights.loc[asset_weights.index >= new_days[0]])
+
+                # drop dates no later trading day reads
+                trading_days = trading_days[len(trading_days) - min(lookback, len(trading_days)):]
+                first = rows.index.get_loc(trading_days[0]) - scoring_rows if len(trading_days) > 0 else len(rows)
+                rows = rows.iloc[max(first, 0):]
+            tail = extended.iloc[len(extended) - scoring_rows:] if scoring_rows > 0 else None
+
+            if backtest.tickers is not None:
+                backtest.update(_trading_prices(data, list(backtest.tickers), base_currency))
+    return backtest
+
+
+def _trading_prices(data: pd.DataFrame, tickers: list, base_currency: str) -> pd.DataFrame:
+    # prices of a chunk converted once, as Strategy.trading_prices()
+    if base_currency is None:
+        return data[tickers]
+    prices = fx.convert(data[tickers + fx.fx_tickers(tickers, base_currency)], base_currency, cache=False)[tickers]
+    return prices.dropna()
@@ -0,0 +1,118 @@
+import inspect
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from core import fx, metrics
+from core.datareader import ReadData
+from core.strategy import Strategy
+from core.universe import Universe
+
+
+ANALYZE_PARAMS = [p for p in inspect.signature(Strategy.analyze).parameters if p not in ["self", "kwargs"]]
+# parameters of ReadData, passed to Universe.load()
+READ_PARAMS = [p for p in inspect.signature(ReadData).parameters
+               if p not in ["tickers", "start", "end", "keepna", "kwargs"]]
+
+# universe shared with worker processes
+_universe = None
+_shm = None
+
+
+def sweep(strategy_cls, grid: dict, fixed: dict = None,
+          trading_price="Close", start=None, end=None, in_krw=True,
+          max_workers=None, chunksize=8, **kwargs) -> pd.DataFrame:
+    """
+    Analyze strategies of all combinations of parameters.
+    Data is read once and shared with worker processes through shared memory.
+    :param strategy_cls: Strategy class such as SAA, BAA and HAA.
+    :param grid: Possible values of each parameter of the constructor or Strategy.analyze (e.g. trading_day).
+    :param fixed: Fixed parameters of the constructor.
+    :param trading_price: Price used when rebalancing assets.
+    :param start: Start date of analyzing period.
+    :param end: End date of analyzing period.
+    :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+    :param max_workers: Number of worker processes. If 1, analyze in this process.
+    :param chunksize: Number of configurations sent to a worker at once.
+    :param kwargs: Other parameters of Strategy.analyze, or of ReadData such as cache.
+    :return: Summary of each configuration.
+    """
+    fixed = fixed or {}
+    read_kwargs = {k: kwargs.pop(k) for k in READ_PARAMS if k in kwargs}
+    configs = [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+    tasks = []
+    for config in configs:
+        params = {**fixed, **{k: v for k, v in config.items() if k not in ANALYZE_PARAMS}}
+        params.setdefault("name", ",".join(f"{k}={_format(v)}" for k, v in config.items()))
+        analyze_params = {"trading_price": trading_price, "in_krw": in_krw, **kwargs,
+                          **{k: v for k, v in config.items() if k in ANALYZE_PARAMS}}
+        tasks.append((strategy_cls, params, analyze_params))
+
+    # read data of all configurations once, with exchange rates to every base currency in the grid
+    strategies = [strategy_cls(**params) for _, params, _ in tasks]
+    base_currencies = {fx.get_base_currency(p["in_krw"], p.get("base_currency")) for _, _, p in tasks}
+    tickers = [t for bc in base_currencies
+               for t in Universe.from_strategies(strategies, in_krw=bc is not None, base_currency=bc).tickers]
+    universe = Universe(tickers).load(start=start, end=end, **read_kwargs)
+
+    if max_workers == 1:
+        _set_universe(universe)
+        summaries = [_analyze(task) for task in tasks]
+    else:
+        data = universe.data
+        values = data.to_numpy(dtype=np.float64)
+        shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        try:
+            np.ndarray(values.shape, dtype=np.float64, buffer=shm.buf)[:] = values
+            initargs = (shm.name, values.shape, data.index, data.columns, universe.tickers)
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                     initializer=_init_worker, initargs=initargs) as executor:
+                summaries = list(executor.map(_analyze, tasks, chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    result = pd.DataFrame([{k: _format(v) for k, v in config.items()} for config in configs])
+    return pd.concat((result, pd.DataFrame(summaries)), axis=1)
+
+
+def summarize(total_return: pd.Series, periods=252) -> dict:
+    """
+    Get summary metrics of total return.
+    :param total_return: Daily total return.
+    :param periods: Number of periods in a year.
+    :return: Summary metrics. See core.metrics.summarize().
+    """
+    return metrics.summarize(total_return.to_frame(), periods).iloc[0].to_dict()
+
+
+def _format(value):
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(str(v) for v in value) + "]"
+    return str(value) if not isinstance(value, (int, float)) else value
+
+
+def _set_universe(universe: Universe):
+    global _universe
+    _universe = universe
+
+
+def _init_worker(shm_name, shape, index, columns, tickers):
+    # keep reference of shared memory, so that the data is not released
+    global _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf)
+    universe = Universe(tickers)
+    universe.data = pd.DataFrame(data=values, index=index, columns=columns, copy=False)
+    _set_universe(universe)
+
+
+def _analyze(task) -> dict:
+    strategy_cls, params, analyze_params = task
+    strategy = strategy_cls(**params)
+    profit = strategy.analyze(universe=_universe, **analyze_params)
+    return summarize(profit["total_return"])
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+CACHE_SIZE = 256
+
+_cache = OrderedDict()
+
+
+def get_trading_days(index: pd.DatetimeIndex, trading_day) -> pd.DatetimeIndex:
+    """
+    Get trading days (rebalancing days) among dates.
+    Possible values of trading_day are:
+        1 ~ 31: Day of month. The first date on or after the day, or the nearest one before the next day.
+        'end', 'ending', 'begin', 'beginning': Last or first date of each month.
+        'weekly', 'week_end', 'week_begin': Last or first date of each week.
+        'quarterly', 'quarter_end', 'quarter_begin': Last or first date of each quarter.
+        'nth:N': N-th date of each month, or the last one if the month has fewer dates. Negative N counts from the end.
+    Results are memoized per (dates, trading_day).
+    :param index: Sorted dates.
+    :param trading_day: Rebalancing day.
+    :return: Trading days.
+    """
+    values = np.asarray(index.values, dtype="datetime64[ns]")
+    key = (len(values), hash(values.tobytes()), trading_day)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    positions = get_trading_positions(values, trading_day)
+    trading_days = index[positions]
+
+    _cache[key] = trading_days
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return trading_days
+
+
+def get_trading_positions(values: np.ndarray, trading_day) -> np.ndarray:
+    """
+    Get positions of trading days among dates.
+    :param values: Sorted dates in datetime64.
+    :param trading_day: Rebalancing day. See get_trading_days().
+    :return: Positions of trading days.
+    """
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if isinstance(trading_day, (int, np.integer)):
+        day_err = _day_error(values, trading_day)
+        return _first_argmin(day_err, _wraps(day_err))
+
+    period = _periods(values, trading_day)
+    rule = trading_day.lower()
+    if rule in ["end", "ending", "weekly", "week_end", "quarterly", "quarter_end"]:
+        return _period_ends(period)
+    elif rule.startswith("nth:"):
+        return _period_nth(period, int(rule[4:]))
+    return _period_begins(period)
+
+
+def get_last_period_start(values: np.ndarray, trading_day) -> int:
+    """
+    Get position of the first date of the last period, such as the last month for 'end'.
+    Trading days before the position don't change when later dates are appended.
+    :param values: Sorted dates in datetime64.
+    :param trading_day: Rebalancing day. See get_trading_days().
+    :return: Position of the first date of the last period, or 0 if there's no date.
+    """
+    if len(values) == 0:
+        return 0
+    return int(_period_begins(_periods(values, trading_day))[-1])
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def _periods(values: np.ndarray, trading_day) -> np.ndarray:
+    # period of each date, in which a single trading day is chosen
+    if isinstance(trading_day, (int, np.integer)):
+        return _wraps(_day_error(values, trading_day))
+    if not isinstance(trading_day, str):
+        raise NotImplementedError(f"trading_day[{trading_day}] is not implemented")
+
+    days = values.astype("datetime64[D]").astype(np.int64)
+    months = values.astype("datetime64[M]").astype(np.int64)
+    rule = trading_day.lower()
+    if rule in ["end", "ending", "begin", "beginning"] or rule.startswith("nth:"):
+        return months
+    elif rule in ["weekly", "week_end", "week_begin"]:
+        return _weeks(days)
+    elif rule in ["quarterly", "quarter_end", "quarter_begin"]:
+        return months // 3
+    raise NotImplementedError(f"trading_day[{trading_day}] is not implemented")
+
+
+def _day_error(values: np.ndarray, trading_day: int) -> np.ndarray:
+    # days from the trading day of the month to each date
+    days = values.astype("datetime64[D]").astype(np.int64)
+    months = values.astype("datetime64[M]").astype(np.int64)
+    day = days - months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + 1
+    return day - trading_day + 31 * (day < trading_day)
+
+
+def _wraps(day_err: np.ndarray) -> np.ndarray:
+    # a new group starts when the error wraps around the day
+    return np.concatenate(([0], np.cumsum(day_err[1:] < day_err[:-1])))
+
+
+def _weeks(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 is Thursday, so weeks start on Monday
+    return (days + 3) // 7
+
+
+def _period_begins(period: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.concatenate(([True], period[1:] != period[:-1])))
+
+
+def _period_ends(period: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.concatenate((period[1:] != period[:-1], [True])))
+
+
+def _period_nth(period: np.ndarray, n: int) -> np.ndarray:
+    if n == 0:
+        raise ValueError("N of 'nth:N' starts from 1")
+    begins = _period_begins(period)
+    ends = np.append(begins[1:], len(period)) - 1
+    if n > 0:
+        return np.minimum(begins + n - 1, ends)
+    return np.maximum(ends + n + 1, begins)
+
+
+def _first_argmin(values: np.ndarray, group: np.ndarray) -> np.ndarray:
+    # position of the first minimum in each group of consecutive positions
+    begins = _period_begins(group)
+    group_min = np.minimum.reduceat(values, begins)
+    is_min = np.flatnonzero(values == group_min[group])
+    first = np.concatenate(([True], group[is_min][1:] != group[is_min][:-1]))
+    return is_min[first]
@@ -0,0 +1,74 @@
+import pandas as pd
+
+from core import fx
+from core.datareader import ReadData
+from core.ticker import Ticker
+
+
+class Universe:
+    """
+    Daily data of a universe of tickers.
+    Data is read once and shared across strategies trading subsets of the universe.
+    """
+
+    def __init__(self, tickers: list[Ticker]):
+        self.tickers = sorted(set(tickers))
+        self.data = None
+        self._prices = {}
+
+    @classmethod
+    def from_strategies(cls, strategies, in_krw=True, base_currency=None):
+        """
+        Get universe of all tickers used by strategies.
+        :param strategies: Strategies.
+        :param in_krw: If true, include KRW for currency conversion.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :return: Universe.
+        """
+        tickers = [t for st in strategies for t in st.tickers]
+        tickers += fx.fx_tickers(tickers, fx.get_base_currency(in_krw, base_currency))
+        return cls(tickers)
+
+    def load(self, start=None, end=None, **kwargs):
+        """
+        Read daily data of all tickers in the universe.
+        :param start: Start date of analyzing period.
+        :param end: End date of analyzing period.
+        :param kwargs:
+        :return: self
+        """
+        self.data = ReadData(self.tickers, start=start, end=end, keepna=True, **kwargs)
+        self._prices = {}
+        return self
+
+    def read_data(self, tickers: list[Ticker], trading_price="Close", in_krw=True, base_currency=None) -> pd.DataFrame:
+        """
+        Get daily data of tickers, same as reading the tickers alone.
+        Dates on which any of the tickers misses data are dropped.
+        :param tickers: Tickers in the universe.
+        :param trading_price: Price used when rebalancing assets.
+        :param in_krw: If true, include KRW for currency conversion.
+        :param base_currency: Currency to convert assets into. Overrides in_krw.
+        :return: Daily data.
+        """
+        assert self.data is not None, "universe is not loaded"
+        tickers = set(tickers + fx.fx_tickers(tickers, fx.get_base_currency(in_krw, base_currency)))
+
+        # select columns of the tickers only, then take their own date intersection
+        columns = [col for col in self.data.columns if col[1] in tickers]
+        data = self.data[columns].dropna()
+        return data[trading_price]
+
+    def prices(self, trading_price="Close", base_currency="KRW") -> pd.DataFrame:
+        """
+        Get daily prices of all assets in the universe converted into base currency.
+        The panel is converted once and shared across strategies.
+        :param trading_price: Price used when rebalancing assets.
+        :param base_currency: Currency to convert assets into.
+        :return: Daily prices in base currency, without exchange rates.
+        """
+        assert self.data is not None, "universe is not loaded"
+        key = (trading_price, base_currency)
+        if key not in self._prices:
+            self._prices[key] = fx.convert(self.data[trading_price], base_currency)
+        return self._prices[key]
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+from core import metrics, trading_calendar
+from core.strategy import Strategy
+
+
+def rolling_windows(index: pd.DatetimeIndex, years=(3, 5, 10), freq="MS") -> list[tuple]:
+    """
+    Get rolling windows within dates.
+    :param index: Dates.
+    :param years: Lengths of windows in years.
+    :param freq: Frequency of start dates, such as 'MS' for the first date of each month.
+    :return: (start, end) of each window. End is exclusive.
+    """
+    windows = []
+    for y in years:
+        last_start = index[-1] - pd.DateOffset(years=y)
+        for start in pd.date_range(index[0], last_start, freq=freq):
+            windows.append((start, start + pd.DateOffset(years=y)))
+    return windows
+
+
+class WindowAnalysis:
+    """
+    Analysis of many start/end windows from a single backtest over the full history.
+    A strategy started at a window begins trading after its own warm-up, e.g. 12 months of momentum lookback,
+    on the same day the full backtest rebalances to the same weights. From that day on both portfolios are
+    identical, so the window's total return is the full total return re-based at that day.
+    Windows are exact when the calendar of trading days from the window start agrees with the full calendar,
+    which is true for the end of month, week and quarter. Unlike analyze(start, end), the last date of a window
+    is not a trading day just because it ends a partial month.
+    """
+
+    def __init__(self, profit: pd.DataFrame, trading_days: pd.DatetimeIndex, index: pd.DatetimeIndex,
+                 trading_day="end"):
+        """
+        :param profit: Daily profit of the full backtest.
+        :param trading_days: Trading days of the full backtest, including the warm-up.
+        :param index: Dates of the data of the full backtest.
+        :param trading_day: Rebalancing day.
+        """
+        self.profit = profit
+        self.total_return = profit["total_return"]
+        self.index = index
+        self.trading_day = trading_day
+        # strategies with a warm-up score the data of the day before trading days,
+        # so a trading day at the first date is not scored
+        self.skip_first = profit.index[0] > trading_days[0]
+        # number of trading days before the first asset weights
+        positions = self._scored(index.get_indexer(trading_days))
+        self.warmup = int(positions.searchsorted(index.get_loc(profit.index[0])))
+
+    @classmethod
+    def from_strategy(cls, strategy: Strategy, trading_day="end", trading_price="Close", start=None, end=None,
+                      in_krw=True, **kwargs) -> "WindowAnalysis":
+        """
+        Run a backtest of the strategy over the full history.
+        :param strategy: Strategy.
+        :param trading_day: Rebalancing day.
+        :param trading_price: Price used when rebalancing assets.
+        :param start: Start date of the full history.
+        :param end: End date of the full history.
+        :param in_krw: If true, convert the currency of USD asset in South Korean Won.
+        :param kwargs: Other parameters of Strategy.analyze, such as universe.
+        :return: WindowAnalysis.
+        """
+        profit = strategy.analyze(trading_day, trading_price, start, end, in_krw, **kwargs)
+        data = strategy.read_data(strategy.tickers, trading_price, start, end, in_krw, **kwargs)
+        trading_days = strategy.get_trading_days(data, trading_day)
+        return cls(profit, trading_days, data.index, trading_day)
+
+    def first_days(self, windows: list[tuple]) -> pd.DatetimeIndex:
+        """
+        Get the first day of each window, the first trading day after the warm-up from the window start.
+        :param windows: (start, end) of each window.
+        :return: First days. NaT if the window ends before the warm-up.
+        """
+        values = np.asarray(self.index.values, dtype="datetime64[ns]")
+        starts = values.searchsorted(np.array([pd.Timestamp(s).to_datetime64() for s, _ in windows]))
+        ends = np.array([pd.Timestamp(e).to_datetime64() for _, e in windows], dtype="datetime64[ns]")
+
+        # windows of different lengths share their start
+        first_of_start = {}
+        for begin in np.unique(starts):
+            positions = trading_calendar.get_trading_positions(values[begin:], self.trading_day)
+            positions = self._scored(positions)
+            first_of_start[begin] = values[begin + positions[self.warmup]] if len(positions) > self.warmup else None
+
+        first_days = np.full(len(windows), np.datetime64("NaT"), dtype="datetime64[ns]")
+        for i, begin in enumerate(starts):
+            first = first_of_start[begin]
+            if first is not None and first < ends[i]:
+                first_days[i] = first
+        return pd.DatetimeIndex(first_days)
+
+    def _scored(self, positions: np.ndarray) -> np.ndarray:
+        if self.skip_first and len(positions) > 0 and positions[0] == 0:
+            return positions[1:]
+        return positions
+
+    def total_returns(self, windows: list[tuple]) -> pd.DataFrame:
+        """
+        Get total return of each window, re-based at its first day.
+        :param windows: (start, end) of each window. End is exclusive.
+        :return: Total return of each window column, NaN outside the window.
+        """
+        values = self.total_return.to_numpy(dtype=np.float64)
+        dates = self.total_return.index
+        first = dates.get_indexer(self.first_days(windows))
+        stop = dates.searchsorted(pd.DatetimeIndex([pd.Timestamp(end) for _, end in windows]))
+
+        positions = np.arange(len(dates))[:, np.newaxis]
+        is_valid = (first >= 0) & (positions >= first) & (positions < stop)
+        base = values[np.maximum(first, 0)]
+        rebased = np.where(is_valid, values[:, np.newaxis] / base, np.nan)
+        columns = pd.MultiIndex.from_tuples([(pd.Timestamp(s), pd.Timestamp(e)) for s, e in windows],
+                                            names=["start", "end"])
+        return pd.DataFrame(data=rebased, index=dates, columns=columns)
+
+    def summarize(self, windows: list[tuple], periods=metrics.PERIODS, rf=0.0) -> pd.DataFrame:
+        """
+        Get summary metrics of each window, same as core.metrics.summarize() of total_returns().
+        Moments of daily returns come from prefix sums, so only drawdowns scan the windows.
+        :param windows: (start, end) of each window. End is exclusive.
+        :param periods: Number of periods in a year.
+        :param rf: Annual risk-free rate.
+        :return: Metrics of each window row. Windows ending before the warm-up are dropped.
+        """
+        values = self.total_return.to_numpy(dtype=np.float64)
+        dates = self.total_return.index
+        first = dates.get_indexer(self.first_days(windows))
+        stop = dates.searchsorted(pd.DatetimeIndex([pd.Timestamp(end) for _, end in windows]))
+        is_valid = first >= 0
+        first, stop = first[is_valid], stop[is_valid]
+        last = stop - 1
+
+        # returns of day t at position t, from deviations to the mean to keep prefix sums precise
+        returns = np.zeros(len(values))
+        returns[1:] = values[1:] / values[:-1] - 1
+        shift = returns[1:].mean() if len(values) > 1 else 0.0
+        excess = returns - rf / periods
+        prefix = [np.concatenate(([0.0], np.cumsum(x))) for x in
+                  (returns - shift, (returns - shift) ** 2, np.minimum(excess, 0) ** 2)]
+
+        # returns in a window are those after its first day
+        n = last - first
+        with np.errstate(invalid="ignore", divide="ignore"):
+            s1, s2, s_down = (p[stop] - p[first + 1] for p in prefix)
+            mean = s1 / n + shift - rf / periods
+            std = np.sqrt(np.maximum(s2 - s1 ** 2 / n, 0) / (n - 1))
+            downside = np.sqrt(s_down / n)
+
+        max_drawdown = np.array([(values[a:b] / np.maximum.accumulate(values[a:b]) - 1).min()
+                                 for a, b in zip(first, stop)])
+        tr = values[last] / values[first]
+        index = pd.MultiIndex.from_tuples(
+            [(pd.Timestamp(s), pd.Timestamp(e)) for (s, e), v in zip(windows, is_valid) if v],
+            names=["start", "end"])
+        return metrics.from_statistics(dates[first], dates[last], tr, mean, std, downside, max_drawdown,
+                                       periods, index)
@@ -1,32 +1,66 @@
+import hashlib
+import json
 import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Tuple
 
+import numpy as np
 import pandas as pd
-import quantstats as qs
 
+from core import metrics, profiling
 from core.strategy import *
 from core.ticker import *
+from core.universe import Universe
 
 
 def analyze_strategies(strategies: List[Strategy],
                        trading_day="end", trading_price="Close", start=None, end=None, in_krw=True, slippage=0.003,
-                       **kwargs):
+                       use_cache=True, **kwargs):
+    # read data of all strategies at once
+    with profiling.stage("load_universe") as record:
+        universe = Universe.from_strategies(strategies, in_krw=in_krw).load(start=start, end=end, **kwargs)
+        record["rows"] = len(universe.data)
+
     result = {}
     for st in strategies:
+        # composites reuse results of their components
+        composite_kwargs = {"results": result} if isinstance(st, Composite) else {}
         rtn = st.analyze(trading_day=trading_day,
                          trading_price=trading_price,
                          start=start,
                          end=end,
                          in_krw=in_krw,
                          slippage=slippage,
+                         universe=universe,
+                         use_cache=use_cache,
+                         **composite_kwargs,
                          **kwargs)
         result[st] = rtn
     return result
 
 
+REPORT_MANIFEST = "manifest.json"
+
+
 def quantstats_reports(result, targets: List[Tuple[Strategy, Strategy]],
                        file_dir="D:/workspace/quant/results",
-                       file_tag="KRW"):
+                       file_tag="KRW",
+                       max_workers=None, force=False):
+    """
+    Save quantstats reports of strategies against benchmarks.
+    Reports are rendered in worker processes. A report whose input return series are unchanged since it was saved
+    is skipped, based on content hashes kept in the manifest of file_dir. Metrics and charts are computed by
+    quantstats for each report, including strategies that appear in several pairs.
+    :param result: Daily profit of each strategy.
+    :param targets: Pairs of (strategy, benchmark).
+    :param file_dir: Directory to save reports in.
+    :param file_tag: Tag appended to file names.
+    :param max_workers: Number of worker processes. If 1, render in this process.
+    :param force: If true, render all reports even if unchanged.
+    """
+    # quantstats loads matplotlib and seaborn, so it is imported only when reporting
+    import quantstats as qs
+
     # validity check
     targets_valid = []
     for st, bm in targets:
@@ -43,21 +77,63 @@ def quantstats_reports(result, targets: List[Tuple[Strategy, Strategy]],
         all_strategies.add(st)
         all_strategies.add(bm)
 
-    all_tr = pd.DataFrame()
-    for st in all_strategies:
-        st_tr = pd.DataFrame(result[st]["total_return"]).rename(columns={"total_return": st})
-        all_tr = pd.concat((all_tr, st_tr), axis=1)
+    # total return and its hash of each strategy, to detect unchanged reports
+    all_tr = {st: result[st]["total_return"].rename(str(st)) for st in all_strategies}
+    all_digest = {st: _digest(all_tr[st]) for st in all_strategies}
+
+    manifest_file = os.path.join(file_dir, REPORT_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            manifest = json.load(f)
 
+    jobs = []
     for st, bm in targets_valid:
-        tr = all_tr[[st, bm]].dropna()
         file_name = "__".join([f"{st}", f"{bm}", file_tag]) + ".html"
         file = os.path.join(file_dir, file_name)
-        qs.reports.html(tr[st], tr[bm],
-                        title=f"{st}",
-                        benchmark_title=f"{bm}",
-                        output="",
-                        download_filename=file)
-        print(f"Saved result of Strategy[{st}] with Benchmark[{bm}] at {file}")
+        digest = hashlib.sha256(
+            f"{st}|{bm}|{all_digest[st]}|{all_digest[bm]}|{qs.__version__}".encode()).hexdigest()
+        if not force and manifest.get(file_name) == digest and os.path.exists(file):
+            print(f"Result of Strategy[{st}] with Benchmark[{bm}] is unchanged. Skip {file}")
+            continue
+        tr = pd.concat((all_tr[st], all_tr[bm]), axis=1).dropna()
+        jobs.append((file, file_name, digest, tr.iloc[:, 0], tr.iloc[:, 1], str(st), str(bm)))
+
+    os.makedirs(file_dir, exist_ok=True)
+    try:
+        with profiling.stage("quantstats_reports", reports=len(jobs)) as record:
+            if max_workers == 1 or len(jobs) <= 1:
+                for job in jobs:
+                    file_name, digest = _save_report(job)
+                    manifest[file_name] = digest
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+                    for file_name, digest in executor.map(_save_report, jobs):
+                        manifest[file_name] = digest
+            record["rows"] = sum(len(job[3]) for job in jobs)
+    finally:
+        with open(manifest_file, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def _digest(total_return: pd.Series) -> str:
+    h = hashlib.sha256()
+    h.update(total_return.index.values.tobytes())
+    h.update(total_return.to_numpy(dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def _save_report(job) -> Tuple[str, str]:
+    import quantstats as qs
+
+    file, file_name, digest, tr_st, tr_bm, st, bm = job
+    qs.reports.html(tr_st, tr_bm,
+                    title=f"{st}",
+                    benchmark_title=f"{bm}",
+                    output=file,
+                    download_filename=file)
+    print(f"Saved result of Strategy[{st}] with Benchmark[{bm}] at {file}")
+    return file_name, digest
 
 
 def print_result(result, history=True):
@@ -70,11 +146,11 @@ def print_result(result, history=True):
         print()
 
 
-if __name__ == "__main__":
-    pd.set_option('display.max_rows', 500)
-    pd.set_option('display.max_columns', 20)
-    pd.set_option('display.width', 1000)
-
+def get_strategies() -> dict:
+    """
+    Get strategies of the experiment.
+    :return: Strategies by name, in the order of analysis.
+    """
     tickers_canary = [SPY, EFA, EEM, AGG]
     tickers_risk_g4 = [QQQ, EFA, EEM, AGG]
     tickers_risk_g12 = [SPY, QQQ, IWM, VGK, EWJ, EEM, VNQ, DBC, GLD, TLT, HYG, LQD]
@@ -83,14 +159,6 @@ if __name__ == "__main__":
     n_risk_g12 = 6
     n_safe = 3
 
-    trading_day = "end"
-    # start = "2019-09-01"
-    start = None
-    # end = "2022-06-30"
-    end = None
-    in_krw = True
-    slippage = 0.003
-
     qqq = SAA("QQQ", [QQQ], [100])
     spy = SAA("SPY", [SPY], [100])
     schd = SAA("SCHD", [SCHD], [100])
@@ -139,6 +207,9 @@ if __name__ == "__main__":
     k_all_weather_psa = SAA("K_ALL_WEATHER_PSA",
                             [TIGER_SNP_500, RISE_US_BOND_F_H, TIGER_US_NOTE_F, ACE_GLD, TIGER_OIL_F_H],
                             [30, 40, 15, 7.5, 7.5])
+    k_baa_all_weather_psa = Composite("K_BAA+ALL_WEATHER_PSA",
+                                      [k_baa_psa, k_all_weather_psa],
+                                      [50, 50])
     # richgo1 = SAA("RICHGO_1",
     #               [SPY, KODEX_200, IEF, TLT_H, LQD, KOSEF_KR_NOTE, GLD],
     #               [50, 8, 12, 10, 10, 0, 10])
@@ -173,45 +244,66 @@ if __name__ == "__main__":
         all_weather,
         k_all_weather,
         k_all_weather_psa,
+        k_baa_all_weather_psa,
         richgo,
         richgo_irp,
     ]
-    result = analyze_strategies(strategies,
+    return {str(st): st for st in strategies}
+
+
+if __name__ == "__main__":
+    pd.set_option('display.max_rows', 500)
+    pd.set_option('display.max_columns', 20)
+    pd.set_option('display.width', 1000)
+
+    trading_day = "end"
+    # start = "2019-09-01"
+    start = None
+    # end = "2022-06-30"
+    end = None
+    in_krw = True
+    slippage = 0.003
+
+    strategies = get_strategies()
+    result = analyze_strategies(list(strategies.values()),
                                 trading_day=trading_day,
                                 start=start,
                                 end=end,
                                 in_krw=in_krw,
                                 slippage=slippage)
     print_result(result, history=False)
+    print(metrics.table(result))
 
     targets = [
-        (qqq, spy),
-        (schd, spy),
-
-        (baa_g4, spy),
-        (baa_g12, spy),
-        (baa_g4, baa_g12),
-        (k_baa_g4, baa_g4),
-        (k_baa, spy),
-        (k_baa, baa_g4),
-        (k_baa, k_baa_g4),
-        (k_baa_psa, k_baa),
-
-        (haa, baa_g4),
-        (k_haa, spy),
-        (k_haa, haa),
-        (k_haa, k_baa),
-        (k_haa_psa, k_haa),
-        (k_haa_psa, k_baa_psa),
-
-        (all_weather, spy),
-        (k_all_weather, all_weather),
-        (k_all_weather, k_baa),
-        (k_all_weather_psa, k_all_weather),
-
-        (richgo, k_baa),
-        (richgo, k_all_weather),
-        (richgo_irp, richgo),
+        (strategies["QQQ"], strategies["SPY"]),
+        (strategies["SCHD"], strategies["SPY"]),
+
+        (strategies["BAA_G4"], strategies["SPY"]),
+        (strategies["BAA_G12"], strategies["SPY"]),
+        (strategies["BAA_G4"], strategies["BAA_G12"]),
+        (strategies["K_BAA_G4"], strategies["BAA_G4"]),
+        (strategies["K_BAA"], strategies["SPY"]),
+        (strategies["K_BAA"], strategies["BAA_G4"]),
+        (strategies["K_BAA"], strategies["K_BAA_G4"]),
+        (strategies["K_BAA_PSA"], strategies["K_BAA"]),
+
+        (strategies["HAA"], strategies["BAA_G4"]),
+        (strategies["K_HAA"], strategies["SPY"]),
+        (strategies["K_HAA"], strategies["HAA"]),
+        (strategies["K_HAA"], strategies["K_BAA"]),
+        (strategies["K_HAA_PSA"], strategies["K_HAA"]),
+        (strategies["K_HAA_PSA"], strategies["K_BAA_PSA"]),
+
+        (strategies["ALL_WEATHER"], strategies["SPY"]),
+        (strategies["K_ALL_WEATHER"], strategies["ALL_WEATHER"]),
+        (strategies["K_ALL_WEATHER"], strategies["K_BAA"]),
+        (strategies["K_ALL_WEATHER_PSA"], strategies["K_ALL_WEATHER"]),
+        (strategies["K_BAA+ALL_WEATHER_PSA"], strategies["K_BAA_PSA"]),
+
+        (strategies["RICHGO"], strategies["K_BAA"]),
+        (strategies["RICHGO"], strategies["K_ALL_WEATHER"]),
+        (strategies["RICHGO_IRP"], strategies["RICHGO"]),
     ]
     file_tag = "KRW" if in_krw else "USD"
     quantstats_reports(result, targets, file_tag=file_tag)
+    profiling.report()
@@ -0,0 +1,92 @@
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from core import datareader
+from core.cache import PriceCache, set_price_cache
+from core.signals import SignalService
+from script.experiment import get_strategies
+
+
+DEFAULT_STRATEGIES = ["K_BAA_PSA", "K_HAA_PSA"]
+
+
+def to_json(weights: dict) -> dict:
+    return {
+        "strategy": weights["strategy"],
+        "trading_day": weights["trading_day"].strftime("%Y-%m-%d"),
+        "scored_on": weights["scored_on"].strftime("%Y-%m-%d"),
+        "weights": {str(t): w for t, w in weights["weights"].items()},
+    }
+
+
+def make_handler(service: SignalService, end=None, **kwargs):
+    class SignalHandler(BaseHTTPRequestHandler):
+        """
+        GET /strategies: names of served strategies
+        GET /weights?strategy=NAME: current target weights of a strategy
+        GET /reload: read price data again
+        """
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            try:
+                if url.path == "/strategies":
+                    self._send(200, list(service.strategies))
+                elif url.path == "/weights":
+                    names = query.get("strategy", list(service.strategies))
+                    self._send(200, [to_json(service.current_weights(name)) for name in names])
+                elif url.path == "/reload":
+                    service.load(end=end, **kwargs)
+                    self._send(200, {"loaded_at": str(service.loaded_at)})
+                else:
+                    self._send(404, {"error": f"unknown path {url.path}"})
+            except KeyError as e:
+                self._send(404, {"error": str(e)})
+            except ValueError as e:
+                self._send(500, {"error": str(e)})
+
+        def _send(self, status: int, body):
+            content = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    return SignalHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Current target weights of strategies")
+    parser.add_argument("strategies", nargs="*", default=DEFAULT_STRATEGIES)
+    parser.add_argument("--trading-day", default="end")
+    parser.add_argument("--end", default=None, help="last date of price data, up to date by default")
+    parser.add_argument("--offline", action="store_true", help="serve cached prices without fetching")
+    parser.add_argument("--replay", default=None, help="directory of recorded data to read instead of remote sources")
+    parser.add_argument("--serve", action="store_true", help="keep data in memory and answer over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    read_kwargs = {}
+    if args.offline:
+        set_price_cache(PriceCache(offline=True))
+    if args.replay is not None:
+        datareader.set_replay("replay", args.replay)
+        read_kwargs["cache"] = False
+
+    strategies = get_strategies()
+    trading_day = int(args.trading_day) if args.trading_day.lstrip("-").isdigit() else args.trading_day
+    service = SignalService([strategies[name] for name in args.strategies], trading_day=trading_day)
+    service.load(end=args.end, **read_kwargs)
+
+    if args.serve:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(service, args.end, **read_kwargs))
+        print(f"Serving {', '.join(service.strategies)} on http://{args.host}:{args.port}")
+        server.serve_forever()
+    else:
+        for name in service.strategies:
+            print(json.dumps(to_json(service.current_weights(name)), indent=2))
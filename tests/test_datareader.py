@@ -0,0 +1,165 @@
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from core.cache import PriceCache
+from core import datareader
+from core.datareader import DataReader, LocalDataReader, NaverDataReader, ReadData, _read_cached
+from core.ticker import Ticker
+
+
+DAYS = pd.bdate_range("2024-01-02", periods=5)
+
+# daily bars of each symbol, served in the chartdata XML of fchart.stock.naver.com
+BARS = {
+    "000001": [(d, 100 + i, 102 + i, 99 + i, 101 + i, 1000 * (i + 1)) for i, d in enumerate(DAYS)],
+    "000002": [(d, 200 + i, 202 + i, 199 + i, 201 + i, 2000 * (i + 1)) for i, d in enumerate(DAYS)],
+}
+
+
+def chartdata(symbol: str) -> str:
+    items = "".join(f'<item data="{d:%Y%m%d}|{o}|{h}|{l}|{c}|{v}" />' for d, o, h, l, c, v in BARS[symbol])
+    return (f'<?xml version="1.0" encoding="EUC-KR" ?><protocol>'
+            f'<chartdata symbol="{symbol}" count="{len(BARS[symbol])}" timeframe="day">{items}</chartdata>'
+            f'</protocol>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Stub of the Naver chart endpoint. The first request of a symbol in failures fails with 500.
+    """
+
+    requests = []
+    failures = set()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        symbol = parse_qs(urlparse(self.path).query)["symbol"][0]
+        with self.lock:
+            self.requests.append(symbol)
+            failing = symbol in self.failures
+            self.failures.discard(symbol)
+        if failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+
+        content = chartdata(symbol).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class NaverDataReaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = NaverDataReader.url
+        NaverDataReader.url = f"http://127.0.0.1:{cls.server.server_address[1]}/sise.nhn"
+
+    @classmethod
+    def tearDownClass(cls):
+        NaverDataReader.url = cls.url
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubHandler.requests = []
+        StubHandler.failures = set()
+        self.tickers = [Ticker(symbol, name=f"T{symbol}", currency="KRW", data_source="naver") for symbol in BARS]
+
+    def read(self) -> pd.DataFrame:
+        return ReadData(self.tickers, start=DAYS[0], end=DAYS[-1], cache=False)
+
+    def test_read(self):
+        df = self.read()
+        self.assertEqual(sorted(StubHandler.requests), sorted(BARS))
+        self.assertTrue(df.index.equals(pd.DatetimeIndex(DAYS)))
+        for t in self.tickers:
+            expected = [bar[4] for bar in BARS[t.symbol]]
+            self.assertEqual(df["Close", t].astype(float).tolist(), expected)
+
+    def test_retry(self):
+        StubHandler.failures = {"000002"}
+        df = self.read()
+        self.assertEqual(StubHandler.requests.count("000001"), 1)
+        self.assertEqual(StubHandler.requests.count("000002"), 2)
+        self.assertEqual(df["Close", self.tickers[1]].astype(float).tolist(), [bar[4] for bar in BARS["000002"]])
+
+
+class PartialDataReader(DataReader):
+    """
+    DataReader of DAYS, which returns no column of symbols in missing, like delisted symbols.
+    """
+
+    inclusive_end = True
+
+    def __init__(self):
+        self.missing = set()
+
+    def read(self, tickers: list[Ticker], start=None, end=None, keepna=False, **kwargs) -> pd.DataFrame:
+        index = DAYS[(DAYS >= pd.Timestamp(start)) & (DAYS <= pd.Timestamp(end))]
+        data = {(a, t): index.day.astype(float) for a in ["Close", "Open"] for t in tickers
+                if t.symbol not in self.missing}
+        return pd.DataFrame(data=data, index=index)
+
+
+class ReadCachedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.cache_dir.name)
+        self.reader = PartialDataReader()
+        self.tickers = [Ticker("AAA", currency="USD"), Ticker("BBB", currency="USD")]
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+
+    def test_missing_ticker_keeps_cache(self):
+        _read_cached(self.reader, self.tickers, self.cache, start=DAYS[0], end=DAYS[2])
+        self.reader.missing = {"BBB"}
+        df = _read_cached(self.reader, self.tickers, self.cache, start=DAYS[0], end=DAYS[-1]).to_frame()
+        self.assertEqual(df["Close", self.tickers[0]].dropna().index[-1], DAYS[-1])
+        self.assertEqual(df["Close", self.tickers[1]].dropna().index.tolist(), DAYS[:3].tolist())
+
+    def test_missing_ticker_without_cache(self):
+        self.reader.missing = {"BBB"}
+        with self.assertRaises(KeyError):
+            _read_cached(self.reader, self.tickers, self.cache, start=DAYS[0], end=DAYS[-1])
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.replay_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.ticker = Ticker("AAA", currency="USD")
+        frame = pd.DataFrame(data={"Close": DAYS.day.astype(float), "Open": DAYS.day.astype(float)}, index=DAYS)
+        LocalDataReader(f"{self.replay_dir.name}/yahoo").save(self.ticker.symbol, frame)
+        datareader.set_replay("replay", self.replay_dir.name)
+
+    def tearDown(self):
+        datareader.set_replay(None)
+        self.replay_dir.cleanup()
+        self.cache_dir.cleanup()
+
+    def test_replay_bypasses_cache(self):
+        cache = PriceCache(self.cache_dir.name)
+        df = ReadData([self.ticker], start=DAYS[0], cache=cache)
+        self.assertEqual(df["Close", self.ticker].tolist(), DAYS.day.astype(float).tolist())
+        self.assertIsNone(cache.load_meta(self.ticker))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from core.score import ScoreEngine
+from core.ticker import AGG, EEM, EFA, SPY
+
+
+DAYS = pd.bdate_range("2020-01-31", periods=24, freq="BM")
+
+
+def prices(tickers, seed=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.05, (len(DAYS), len(tickers))), axis=0))
+    return pd.DataFrame(data=values, index=DAYS, columns=tickers)
+
+
+class ScoreEngineTest(unittest.TestCase):
+
+    def test_hit_skips_computation(self):
+        engine = ScoreEngine()
+        data = prices([SPY, EFA, EEM, AGG])
+        expected = engine.weighted_returns(data, {1: 12, 3: 4, 6: 2, 12: 1})
+        self.assertEqual((engine.hits, engine.misses), (0, 16))
+
+        # another frame of the same assets and calendar, such as the canary assets of another strategy
+        with mock.patch.object(pd.Series, "pct_change") as pct_change:
+            actual = engine.weighted_returns(data[[EEM, SPY]].copy(), {1: 12, 3: 4, 6: 2, 12: 1})
+        pct_change.assert_not_called()
+        self.assertEqual((engine.hits, engine.misses), (8, 16))
+        pd.testing.assert_frame_equal(actual, expected[[EEM, SPY]])
+
+    def test_changed_prices(self):
+        engine = ScoreEngine()
+        data = prices([SPY, EFA])
+        engine.sma(data, 13)
+
+        # prices of the same dates, such as another trading price or an updated bar of the last day
+        changed = data.copy()
+        changed.iloc[-1, 0] *= 1.01
+        actual = engine.sma(changed, 13)
+        self.assertEqual((engine.hits, engine.misses), (1, 3))
+        pd.testing.assert_frame_equal(actual, changed.rolling(window=13).mean())
+
+    def test_other_calendar(self):
+        engine = ScoreEngine()
+        data = prices([SPY])
+        engine.returns(data, 1)
+        actual = engine.returns(data.iloc[1:], 1)
+        self.assertEqual((engine.hits, engine.misses), (0, 2))
+        pd.testing.assert_frame_equal(actual, data.iloc[1:].pct_change(periods=1))
+
+    def test_eviction(self):
+        engine = ScoreEngine(maxsize=2)
+        data = prices([SPY, EFA, EEM])
+        engine.returns(data, 1)
+        self.assertEqual(list(engine.cache), [(t, (DAYS[0], len(DAYS)), DAYS[-1], ("returns", 1))
+                                              for t in [EFA, EEM]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_universe
+from core import kernel, simulator
+from core.streaming import stream_strategy
+from core.strategy import BAA, SAA, Strategy
+from core.ticker import AGG, BIL, DBC, EEM, EFA, GLD, IEF, LQD, QQQ, SPY, TIP, TLT
+
+
+SAA_ = SAA("ALL_WEATHER", [SPY, TLT, IEF, GLD, DBC], [30, 40, 15, 7.5, 7.5])
+BAA_ = BAA("BAA_G4", [SPY, EFA, EEM, AGG], [QQQ, EFA, EEM, AGG], [TLT, IEF, AGG, TIP, LQD, BIL, DBC])
+STRATEGIES = [SAA_, BAA_]
+TRADING_DAYS = ["end", 15, "begin"]
+
+# fixed synthetic prices of the strategies, converted into KRW
+UNIVERSE = synthetic_universe(STRATEGIES, years=4)
+
+
+def simulation_inputs(strategy: Strategy, trading_day):
+    data = strategy.read_data(strategy.tickers, universe=UNIVERSE)
+    asset_weights = strategy.asset_weights_from_data(data, trading_day)
+    return asset_weights, Strategy.simulation_inputs(data, asset_weights, universe=UNIVERSE)
+
+
+class KernelTest(unittest.TestCase):
+    """
+    core.kernel.simulate() against core.simulator.simulate(), which it replaces in calendar mode.
+    """
+
+    def test_same_as_simulator(self):
+        for strategy in STRATEGIES:
+            for trading_day in TRADING_DAYS:
+                with self.subTest(strategy=str(strategy), trading_day=trading_day):
+                    asset_weights, (_, _, change, rebalance, weights) = simulation_inputs(strategy, trading_day)
+                    expected = kernel.simulate(change, rebalance, weights, 0.003)
+                    rates = simulator.slippage_rates(0.003, list(asset_weights.columns))
+                    actual = simulator.simulate(change, rebalance, weights, rates)
+                    for e, a in zip(expected[:3], actual[:3]):
+                        np.testing.assert_array_equal(a, e)
+
+    def test_state_across_chunks(self):
+        for trading_day in TRADING_DAYS:
+            with self.subTest(trading_day=trading_day):
+                _, (_, _, change, rebalance, weights) = simulation_inputs(BAA_, trading_day)
+                expected = kernel.simulate(change, rebalance, weights, 0.003)
+
+                # split between trading days, and at a trading day
+                results, state, start = [], None, 0
+                for end in (len(change) // 3, rebalance[len(rebalance) // 2], len(change)):
+                    chunk = (rebalance >= start) & (rebalance < end)
+                    results.append(kernel.simulate(change[start:end], rebalance[chunk] - start, weights[chunk],
+                                                   0.003, state))
+                    state, start = results[-1][3], end
+                for i in range(3):
+                    np.testing.assert_allclose(np.concatenate([r[i] for r in results]), expected[i], rtol=1e-12)
+
+
+class SimulatorTest(unittest.TestCase):
+    """
+    Rules of core.simulator.simulate() against calendar rebalancing of core.kernel.
+    """
+
+    def test_slippage_of_currency(self):
+        for trading_day in TRADING_DAYS:
+            with self.subTest(trading_day=trading_day):
+                expected = BAA_.analyze(trading_day, universe=UNIVERSE)
+                actual = BAA_.analyze(trading_day, universe=UNIVERSE, slippage={"USD": 0.003})
+                pd.testing.assert_frame_equal(actual, expected)
+
+    def test_slippage_of_tickers(self):
+        # the lowest and highest rates bound the profit of mixed rates
+        slippage = {t: 0.001 if i % 2 == 0 else 0.005 for i, t in enumerate(BAA_.tickers)}
+        for trading_day in TRADING_DAYS:
+            with self.subTest(trading_day=trading_day):
+                low = BAA_.analyze(trading_day, universe=UNIVERSE, slippage=0.001)["total_return"]
+                high = BAA_.analyze(trading_day, universe=UNIVERSE, slippage=0.005)["total_return"]
+                mixed = BAA_.analyze(trading_day, universe=UNIVERSE, slippage=slippage)["total_return"]
+                self.assertTrue((high <= mixed).all() and (mixed <= low).all())
+                self.assertTrue((high.iloc[-1] < mixed.iloc[-1]) and (mixed.iloc[-1] < low.iloc[-1]))
+
+    def test_band(self):
+        for strategy in STRATEGIES:
+            for trading_day in TRADING_DAYS:
+                with self.subTest(strategy=str(strategy), trading_day=trading_day):
+                    expected = strategy.analyze(trading_day, universe=UNIVERSE)
+                    # any drift is out of the band of zero. Weights that can't drift, such as a single asset held,
+                    # are not rebalanced but stay the same.
+                    actual = strategy.analyze(trading_day, universe=UNIVERSE, band=0.0)
+                    self.assertFalse((actual["is_trading_day"] & ~expected["is_trading_day"]).any())
+                    pd.testing.assert_frame_equal(actual.drop(columns="is_trading_day"),
+                                                  expected.drop(columns="is_trading_day"), check_exact=False,
+                                                  rtol=1e-12)
+
+                    # nothing drifts out of the band of one, so only the first trading day is rebalanced
+                    actual = strategy.analyze(trading_day, universe=UNIVERSE, band=1.0)
+                    self.assertEqual(actual["is_trading_day"].sum(), 1)
+                    self.assertTrue(actual["is_trading_day"].iloc[0])
+
+    def test_capital(self):
+        for strategy in STRATEGIES:
+            for trading_day in TRADING_DAYS:
+                with self.subTest(strategy=str(strategy), trading_day=trading_day):
+                    # whole shares of a large capital are close to the weights, without slippage which the kernel
+                    # doesn't charge on assets sold out of NaN target weights
+                    expected = strategy.analyze(trading_day, universe=UNIVERSE, slippage=0.0)
+                    actual = strategy.analyze(trading_day, universe=UNIVERSE, slippage=0.0, capital=1e12)
+                    self.assertTrue((actual["cash"] >= 0).all())
+                    self.assertLess(actual["cash"].max(), 1e-6)
+                    np.testing.assert_allclose(actual["total_return"], expected["total_return"], rtol=1e-6)
+                    pd.testing.assert_series_equal(actual["is_trading_day"], expected["is_trading_day"])
+
+
+class StreamingTest(unittest.TestCase):
+    """
+    core.streaming.stream_strategy() against Strategy.analyze() over the whole prices.
+    """
+
+    def test_same_as_analyze(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profit.csv")
+            for strategy in STRATEGIES:
+                for trading_day in TRADING_DAYS:
+                    with self.subTest(strategy=str(strategy), trading_day=trading_day):
+                        expected = strategy.analyze(trading_day, universe=UNIVERSE)
+                        backtest = stream_strategy(strategy, trading_day, universe=UNIVERSE, path=path,
+                                                   period=pd.DateOffset(months=7))
+                        actual = pd.read_csv(path, index_col=0, parse_dates=True, float_precision="round_trip")
+
+                        self.assertEqual(backtest.n_days, len(expected))
+                        self.assertTrue(actual.index.equals(expected.index))
+                        self.assertEqual(list(actual.columns), [str(c) for c in expected.columns])
+                        np.testing.assert_array_equal(actual["is_trading_day"], expected["is_trading_day"])
+                        np.testing.assert_allclose(actual.to_numpy(dtype=np.float64),
+                                                   expected.to_numpy(dtype=np.float64), rtol=1e-12, atol=1e-15)
+                        self.assertAlmostEqual(backtest.total_return, expected["total_return"].iloc[-1], delta=1e-12)
+
+
+if __name__ == "__main__":
+    unittest.main()